@@ -14,6 +14,8 @@ from .api.verify import verify
 from .api.oauth import oauth
 from .api.dataio import dataio
 from .api.archive import archive
+from .utils.http_clients import init_http_clients
+from .supabase_db import init_storage
 
 def create_app():
     app = Flask(__name__)
@@ -42,6 +44,12 @@ def create_app():
         SUPABASE_KEY=os.getenv('SUPABASE_KEY')
     )
     
+    # Shared keep-alive HTTP clients for Notion and VAPI (Supabase: utils.supabase_client)
+    init_http_clients(app)
+    
+    # Local sqlite files live under DATA_DIR
+    init_storage(app)
+    
     # Register blueprints with correct prefixes
     app.register_blueprint(oauth, url_prefix='/oauth')
     app.register_blueprint(verify, url_prefix='/api')
@@ -1,17 +1,84 @@
-from flask import Blueprint, request, jsonify, current_app
-from ..utils.errors import AuthError
+from flask import Blueprint, request, jsonify, current_app, has_app_context, url_for
+from ..utils.errors import AuthError, ArchiveError, NotionUnavailableError
+from ..utils.ttl_cache import TTLCache
+from ..utils.notion_client import notion_request, token_key, RETRYABLE_STATUSES
+from ..utils.archive_queue import ArchiveQueue, start_workers, SUCCEEDED, PARTIAL, FAILED
+from ..utils.archive_index import ArchiveIndex
+from ..utils.archive_spool import ArchiveSpool, start_replayer
+from ..utils.token_vault import TokenVault
+from ..utils.archive_stream import FileContent, parse_archive_request, describe_file
+from ..utils.notion_upload import upload_file, file_block
+from ..utils.name_template import render_template
 import base64
 import os
 import json
+import random
 import requests
-from string import Template
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Get DocuSign URL base from environment
 DOCUSIGN_URL_BASE = os.getenv('DOCUSIGN_URL_BASE', 'apps-d.docusign.com')
 
+# Archive database IDs per Notion workspace, keyed by a hash of the token
+database_cache = TTLCache(
+    maxsize=int(os.getenv('NOTION_DB_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('NOTION_DB_CACHE_TTL', 3600))
+)
+
+# Upper bound on concurrent Notion page creations per archive request
+ARCHIVE_MAX_CONCURRENCY = int(os.getenv('ARCHIVE_MAX_CONCURRENCY', 4))
+
+# Upload the signed document bytes to Notion, not just its metadata
+ARCHIVE_UPLOAD_FILES = os.getenv('ARCHIVE_UPLOAD_FILES', 'true').lower() == 'true'
+
+# Durable async mode: queue requests in SQLite and answer 202 right away.
+# ARCHIVE_QUEUE_ENABLED allows it per request ("Prefer: respond-async"),
+# ARCHIVE_ASYNC_MODE queues every request.
+ARCHIVE_ASYNC_MODE = os.getenv('ARCHIVE_ASYNC_MODE', 'false').lower() == 'true'
+ARCHIVE_QUEUE_ENABLED = ARCHIVE_ASYNC_MODE or os.getenv('ARCHIVE_QUEUE_ENABLED', 'false').lower() == 'true'
+ARCHIVE_QUEUE_WORKERS = int(os.getenv('ARCHIVE_QUEUE_WORKERS', 2))
+ARCHIVE_JOB_MAX_ATTEMPTS = int(os.getenv('ARCHIVE_JOB_MAX_ATTEMPTS', 5))
+archive_queue = None
+
+# Notion tokens for queued work, encrypted with JWT_SECRET_KEY; jobs keep a reference
+token_vault = None
+
+# Where the queue, its blobs, the token vault, the index and the spool live,
+# from app config (ARCHIVE_*_PATH / _DIR, relative to DATA_DIR)
+archive_paths = {}
+
+# Idempotency index of already-archived files, so redeliveries skip Notion
+ARCHIVE_INDEX_TTL = int(os.getenv('ARCHIVE_INDEX_TTL', 7 * 24 * 3600))
+ARCHIVE_INDEX_MAX_ENTRIES = int(os.getenv('ARCHIVE_INDEX_MAX_ENTRIES', 100000))
+# A file being archived is claimed first; a redelivery waits up to ARCHIVE_CLAIM_WAIT
+# seconds for that page, and a claim older than ARCHIVE_CLAIM_TTL is taken over
+ARCHIVE_CLAIM_TTL = float(os.getenv('ARCHIVE_CLAIM_TTL', 300))
+ARCHIVE_CLAIM_WAIT = float(os.getenv('ARCHIVE_CLAIM_WAIT', 30))
+archive_index = None
+
+# Local spool for page creates that fail while Notion is down, replayed later
+ARCHIVE_SPOOL_ENABLED = os.getenv('ARCHIVE_SPOOL_ENABLED', 'false').lower() == 'true'
+ARCHIVE_SPOOL_REPLAY_RATE = float(os.getenv('ARCHIVE_SPOOL_REPLAY_RATE', 1))
+archive_spool = None
+
 archive = Blueprint('archive', __name__)
 
+@archive.record_once
+def configure_paths(state):
+    """Resolve archive storage paths from app config; nothing is created until used"""
+    config = state.app.config
+    for name in ('ARCHIVE_QUEUE_PATH', 'ARCHIVE_BLOB_DIR', 'ARCHIVE_VAULT_PATH', 'ARCHIVE_INDEX_PATH', 'ARCHIVE_SPOOL_DIR'):
+        archive_paths[name] = os.path.join(config['DATA_DIR'], config[name])
+
+def archive_path(name):
+    """Configured path for name, with its parent directory created"""
+    path = archive_paths[name]
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    return path
+
 @archive.route('/archive', methods=['POST'])
 def archive_files():
     """
@@ -27,17 +94,25 @@ def archive_files():
             "pathTemplateValues": ["1", "Contract negotiation"]
         }]
     }
+
+    The body is parsed as a stream and each file's content is decoded into a
+    spooled temp file, so only sizes and hashes are ever logged.
     """
+    data = None
     try:
         print("\n=== Archive Request ===")
         print("Headers:", dict(request.headers))
-        data = request.get_json()
-        print("Request Data:", json.dumps(data, indent=2))
+        try:
+            data = parse_archive_request(request.stream)
+        except ValueError as e:
+            print(f"❌ Invalid archive request body: {str(e)}")
+            return jsonify({"message": "Invalid JSON body"}), 400
         
-        if not data or 'files' not in data:
+        if not data or not isinstance(data.get('files'), list):
             return jsonify({
                 "message": "No files provided"
             }), 400
+        print("Request Data:", json.dumps([describe_file(file) for file in data['files']], indent=2))
             
         # Get Notion token from Authorization header
         auth_header = request.headers.get('Authorization')
@@ -45,109 +120,458 @@ def archive_files():
             return jsonify({"message": "No authorization token provided"}), 401
         notion_token = auth_header.split(' ')[1]
         
-        # Get or create database
-        database_id = get_default_database(notion_token)
-        if not database_id:
-            return jsonify({"message": "Could not find or create database"}), 500
-            
-        # Process each file
-        processed_files = []
-        failed_files = []
-        for file in data['files']:
-            # Replace template variables in filename
-            filename = file['name']
-            if 'pathTemplateValues' in file:
-                for i, value in enumerate(file['pathTemplateValues']):
-                    filename = filename.replace(f"{{{{Get Signatures.envelopeId}}}}", value) if i == 0 else filename
-            
-            print(f"\n=== Creating Page ===")
-            print(f"Processed Filename: {filename}")
+        if wants_async():
+            payload = {"files": persist_files(data['files']), "processed": []}
+            job_id = get_archive_queue().enqueue(get_token_vault().put(notion_token), payload)
+            print(f"📥 Queued archive job {job_id} with {len(data['files'])} file(s)")
+            return jsonify({
+                "message": f"{len(data['files'])} file{'s' if len(data['files']) != 1 else ''} queued for upload",
+                "jobId": job_id,
+                "statusUrl": url_for('archive.archive_job_status', job_id=job_id, _external=True)
+            }), 202
+        
+        processed_files, failed_files, _ = process_archive(notion_token, data['files'])
+        body, status = summarize(processed_files, failed_files)
+        return jsonify(body), status
             
-            # Create page first
-            page_data = {
-                "parent": {"database_id": database_id},
-                "properties": {
-                    "Title": {
-                        "title": [{"type": "text", "text": {"content": filename}}]
-                    },
-                    "Contract Status": {
-                        "select": {"name": "Archived"}
-                    },
-                    "Archive Date": {
-                        "date": {"start": datetime.now().isoformat()}
-                    },
-                    "Document Type": {
-                        "select": {"name": "Agreement"}
-                    },
-                    "File Name": {
-                        "rich_text": [{"type": "text", "text": {"content": filename}}]
-                    },
-                    "File Path": {
-                        "rich_text": [{"type": "text", "text": {"content": file.get('path', '')}}]
-                    },
-                    "Department": {
-                        "rich_text": [{"type": "text", "text": {"content": ""}}]
-                    },
-                    "File URL": {
-                        "url": f"https://{DOCUSIGN_URL_BASE}/send/documents/details/{file.get('path', '')}"
-                    }
-                }
-            }
+    except ArchiveError as e:
+        print(f"❌ Archive Error: {e.message}")
+        return jsonify({"message": e.message}), e.status_code
+    except Exception as e:
+        print(f"❌ Archive Error: {str(e)}")
+        return jsonify({
+            "message": f"Something went wrong: {str(e)}"
+        }), 500
+    finally:
+        if data and isinstance(data.get('files'), list):
+            close_files(data['files'])
 
-            # Create the page
-            headers = {
-                'Authorization': f'Bearer {notion_token}',
-                'Notion-Version': '2022-06-28',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(
-                'https://api.notion.com/v1/pages',
-                headers=headers,
-                json=page_data
-            )
+@archive.route('/archive/jobs/<job_id>', methods=['GET'])
+def archive_job_status(job_id):
+    """Return the status of a queued archive job"""
+    if not ARCHIVE_QUEUE_ENABLED:
+        return jsonify({"message": "Archive queue is disabled"}), 404
+    job = get_archive_queue().get(job_id)
+    if not job:
+        return jsonify({"message": "Archive job not found"}), 404
+    return jsonify(job), 200
 
-            if response.status_code == 200:
+def wants_async():
+    """True if this request should be queued instead of archived inline"""
+    if not ARCHIVE_QUEUE_ENABLED:
+        return False
+    prefer = request.headers.get('Prefer', '')
+    return ARCHIVE_ASYNC_MODE or 'respond-async' in prefer
+
+def process_archive(notion_token, files):
+    """
+    Archive files to Notion.
+
+    Returns (processed filenames, failed filenames, indexes of failed files)
+    with results in input order.
+    """
+    # Get or create database
+    database_id = get_default_database(notion_token)
+    if not database_id:
+        raise ArchiveError("Could not find or create database", status_code=500)
+        
+    # Create pages concurrently, keeping results in input order
+    processed_files = []
+    failed_files = []
+    failed_indexes = []
+    workers = min(ARCHIVE_MAX_CONCURRENCY, len(files)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            lambda file: create_page(notion_token, database_id, file),
+            files
+        )
+        for index, (filename, created) in enumerate(results):
+            if created:
                 processed_files.append(filename)
-                print(f"✅ Created page for {filename}")
             else:
-                print(f"❌ Failed to create page: {response.text}")
                 failed_files.append(filename)
-                continue
+                failed_indexes.append(index)
+    return processed_files, failed_files, failed_indexes
+
+def summarize(processed_files, failed_files):
+    """Build the DocuSign response body and status for an archive result"""
+    if not processed_files and failed_files:
+        return {
+            "message": f"Failed to upload {len(failed_files)} file(s)",
+            "failed": failed_files
+        }, 500
+    elif failed_files:
+        return {
+            "message": f"Partially successful: {len(processed_files)} uploaded, {len(failed_files)} failed",
+            "failed": failed_files
+        }, 207
         
-        # Return appropriate response based on success/failure
-        if not processed_files and failed_files:
-            return jsonify({
-                "message": f"Failed to upload {len(failed_files)} file(s)",
-                "failed": failed_files
-            }), 500
-        elif failed_files:
-            return jsonify({
-                "message": f"Partially successful: {len(processed_files)} uploaded, {len(failed_files)} failed",
-                "failed": failed_files
-            }), 207
-            
-        return jsonify({
-            "message": f"{len(processed_files)} file{'s' if len(processed_files) != 1 else ''} successfully uploaded"
-        }), 200
-            
+    return {
+        "message": f"{len(processed_files)} file{'s' if len(processed_files) != 1 else ''} successfully uploaded"
+    }, 200
+
+def handle_archive_job(job):
+    """Worker entry point: archive a queued job, retrying failed files with backoff"""
+    payload = job['payload']
+    notion_token = get_token_vault().get(job['workspace'])
+    if not notion_token:
+        remove_blobs(payload['files'])
+        get_archive_queue().finish(job['id'], FAILED, {"message": "Notion token for this job is no longer available"})
+        return
+    files = load_files(payload['files'])
+    try:
+        processed_files, failed_files, failed_indexes = process_archive(notion_token, files)
     except Exception as e:
-        print(f"❌ Archive Error: {str(e)}")
-        return jsonify({
-            "message": f"Something went wrong: {str(e)}"
-        }), 500
+        print(f"❌ Archive job {job['id']} attempt {job['attempts']} failed: {str(e)}")
+        processed_files, failed_indexes = [], list(range(len(files)))
+        failed_files = [file.get('name', '') for file in files]
+    finally:
+        close_files(files)
+    processed_files = payload['processed'] + processed_files
+    body, status = summarize(processed_files, failed_files)
 
-def get_default_database(notion_token):
-    """Get or create DocuSign Contract Archive database"""
-    headers = {
-        'Authorization': f'Bearer {notion_token}',
-        'Notion-Version': '2022-06-28'
-    }
+    remaining = [payload['files'][i] for i in failed_indexes]
+    remove_blobs([file for i, file in enumerate(payload['files']) if i not in failed_indexes])
+    if not remaining:
+        get_archive_queue().finish(job['id'], SUCCEEDED, body)
+    elif job['attempts'] >= get_archive_queue().max_attempts:
+        remove_blobs(remaining)
+        get_archive_queue().finish(job['id'], PARTIAL if processed_files else FAILED, body)
+    else:
+        delay = random.uniform(0.5, 1.0) * min(300, 5 * 2 ** job['attempts'])
+        print(f"🔄 Retrying {len(remaining)} file(s) of archive job {job['id']} in {delay:.0f}s")
+        get_archive_queue().retry(
+            job['id'],
+            {"files": remaining, "processed": processed_files},
+            body,
+            delay
+        )
+
+def persist_files(files):
+    """Swap each file's spooled content for a blob on disk that a queued job can reference"""
+    blob_dir = archive_path('ARCHIVE_BLOB_DIR')
+    os.makedirs(blob_dir, exist_ok=True)
+    persisted = []
+    for file in files:
+        content = file.get('content')
+        if isinstance(content, FileContent):
+            content = content.persist(os.path.join(blob_dir, str(uuid.uuid4())))
+        persisted.append({**file, 'content': content})
+    return persisted
+
+def load_files(files):
+    """Reopen the content of queued files"""
+    return [
+        {**file, 'content': FileContent.from_meta(file['content'])} if file.get('content') else file
+        for file in files
+    ]
+
+def close_files(files):
+    for file in files:
+        if isinstance(file.get('content'), FileContent):
+            file['content'].close()
+
+def remove_blobs(files):
+    for file in files:
+        meta = file.get('content')
+        if isinstance(meta, dict):
+            try:
+                os.remove(meta['path'])
+            except FileNotFoundError:
+                pass
+
+def get_archive_queue():
+    global archive_queue
+    if archive_queue is None:
+        archive_queue = ArchiveQueue(archive_path('ARCHIVE_QUEUE_PATH'), max_attempts=ARCHIVE_JOB_MAX_ATTEMPTS)
+    return archive_queue
+
+def get_token_vault():
+    global token_vault
+    if token_vault is None:
+        config = current_app.config if has_app_context() else {}
+        token_vault = TokenVault(archive_path('ARCHIVE_VAULT_PATH'), config.get('JWT_SECRET_KEY') or os.getenv('JWT_SECRET_KEY'))
+    return token_vault
+
+def get_archive_index():
+    global archive_index
+    if archive_index is None:
+        archive_index = ArchiveIndex(
+            archive_path('ARCHIVE_INDEX_PATH'),
+            ttl=ARCHIVE_INDEX_TTL,
+            max_entries=ARCHIVE_INDEX_MAX_ENTRIES
+        )
+    return archive_index
+
+@archive.record_once
+def start_archive_workers(state):
+    """Start the background workers that drain the archive queue"""
+    if ARCHIVE_QUEUE_ENABLED and ARCHIVE_QUEUE_WORKERS > 0:
+        with state.app.app_context():
+            # Workers resolve tokens outside any request, so open the vault now
+            get_token_vault()
+        queue = get_archive_queue()
+        queue.recover()
+        start_workers(queue, handle_archive_job, ARCHIVE_QUEUE_WORKERS)
+
+def create_page(notion_token, database_id, file):
+    """Create the Notion page for one archived file, returning (filename, created)"""
+    # Replace template variables in filename and path
+    values = file.get('pathTemplateValues') or []
+    filename = render_template(file['name'], values)
+    path = render_template(file.get('path', ''), values)
     
+    print(f"\n=== Creating Page ===")
+    print(f"Processed Filename: {filename}")
+    print(f"Processed Path: {path}")
+
+    # Skip files this workspace already archived or is archiving right now
+    # (DocuSign redelivers on timeout, often while the first create is running)
+    content = file.get('content')
+    index_key = None
+    if isinstance(content, FileContent):
+        index_key = (token_key(notion_token), f"{path}/{filename}", content.sha256)
+        page_id = claim_archive(index_key)
+        if page_id:
+            print(f"⏭️ {filename} already archived as page {page_id}")
+            return filename, True
+        if page_id is not None:
+            print(f"⏭️ {filename} is still being archived by an earlier delivery")
+            return filename, True
+    try:
+        return create_claimed_page(notion_token, database_id, content, filename, path, index_key)
+    finally:
+        if index_key:
+            # No-op once the page was recorded; otherwise a later delivery may try again
+            get_archive_index().release(*index_key)
+
+def claim_archive(index_key):
+    """
+    Claim a file in the archive index before creating its page.
+
+    Returns None once claimed, the page ID if the file is already archived,
+    or '' if another request still holds the claim after ARCHIVE_CLAIM_WAIT.
+    """
+    index = get_archive_index()
+    deadline = time.monotonic() + ARCHIVE_CLAIM_WAIT
+    while True:
+        claimed, page_id = index.claim(*index_key, claim_ttl=ARCHIVE_CLAIM_TTL)
+        if claimed:
+            return None
+        if page_id:
+            return page_id
+        if time.monotonic() >= deadline:
+            return ''
+        time.sleep(0.5)
+
+def create_claimed_page(notion_token, database_id, content, filename, path, index_key):
+    """Create the page for a file create_page has claimed, returning (filename, created)"""
+    # Create page first
+    page_data = {
+        "parent": {"database_id": database_id},
+        "properties": {
+            "Title": {
+                "title": [{"type": "text", "text": {"content": filename}}]
+            },
+            "Contract Status": {
+                "select": {"name": "Archived"}
+            },
+            "Archive Date": {
+                "date": {"start": datetime.now().isoformat()}
+            },
+            "Document Type": {
+                "select": {"name": "Agreement"}
+            },
+            "File Name": {
+                "rich_text": [{"type": "text", "text": {"content": filename}}]
+            },
+            "File Path": {
+                "rich_text": [{"type": "text", "text": {"content": path}}]
+            },
+            "Department": {
+                "rich_text": [{"type": "text", "text": {"content": ""}}]
+            },
+            "File URL": {
+                "url": f"https://{DOCUSIGN_URL_BASE}/send/documents/details/{path}"
+            }
+        }
+    }
+
+    # Upload the signed document and attach it to the page
+    if ARCHIVE_UPLOAD_FILES and isinstance(content, FileContent) and content.size:
+        try:
+            upload_id = upload_file(notion_token, content, filename)
+        except (requests.ConnectionError, requests.Timeout, TimeoutError, NotionUnavailableError) as e:
+            # Keep the bytes with the page so the replayer can upload them later
+            if spool_page(notion_token, page_data, index_key, filename, str(e), content=content):
+                return filename, True
+            print(f"❌ Failed to upload {filename}: {str(e)}")
+            return filename, False
+        except ArchiveError as e:
+            # Notion refused the file itself (size limit, type); keep the metadata page at least
+            print(f"⚠️ Upload of {filename} rejected, creating the page without it: {e.message}")
+        else:
+            page_data["children"] = [file_block(upload_id, filename)]
+
+    # Create the page
+    try:
+        response = notion_request('POST', '/pages', notion_token, json=page_data)
+    except (requests.ConnectionError, requests.Timeout, TimeoutError) as e:
+        if spool_page(notion_token, page_data, index_key, filename, str(e)):
+            return filename, True
+        raise
+
+    if response.status_code in RETRYABLE_STATUSES and spool_page(notion_token, page_data, index_key, filename, response.text):
+        return filename, True
+
+    if response.status_code == 200:
+        print(f"✅ Created page for {filename}")
+        if index_key:
+            get_archive_index().record(*index_key, response.json()['id'])
+        return filename, True
+
+    if is_not_found(response):
+        # Cached database was deleted or unshared, look it up again next time
+        database_cache.invalidate(token_key(notion_token))
+    print(f"❌ Failed to create page: {response.text}")
+    return filename, False
+
+def spool_page(notion_token, page_data, index_key, filename, reason, content=None):
+    """
+    Park a page create that failed because Notion is down; True if spooled.
+
+    content, if given, is a file whose upload failed too: its bytes are kept
+    as a spool blob and uploaded on replay.
+    """
+    if not ARCHIVE_SPOOL_ENABLED:
+        return False
+    spool = get_archive_spool()
+    spool.append({
+        "workspace": get_token_vault().put(notion_token),
+        "page": page_data,
+        "upload": content.persist(spool.blob_path()) if content is not None else None,
+        "index_key": list(index_key) if index_key else None,
+        "filename": filename
+    })
+    print(f"💾 Notion unavailable, spooled page for {filename}: {reason}")
+    return True
+
+def spooled_token(record):
+    """Resolve a spooled record's workspace to its Notion token"""
+    # Records spooled before workspace references carried the token itself
+    notion_token = record.get('notion_token') or get_token_vault().get(record.get('workspace'))
+    if not notion_token:
+        raise ValueError("Notion token for this workspace is no longer available")
+    return notion_token
+
+def notion_healthy(record):
+    """Cheap authenticated call to check Notion is answering for this workspace"""
+    try:
+        notion_token = spooled_token(record)
+    except ValueError:
+        # Let replay_page dead-letter it
+        return True
+    try:
+        return notion_request('GET', '/users/me', notion_token).status_code == 200
+    except (requests.ConnectionError, requests.Timeout, TimeoutError):
+        return False
+
+def replay_page(record):
+    """Replay one spooled page create; False means Notion is still failing"""
+    index_key = record.get('index_key')
+    if index_key and get_archive_index().lookup(*index_key):
+        remove_blobs([{'content': record.get('upload')}])
+        return True
+    notion_token = spooled_token(record)
+    page = record['page']
+    try:
+        upload_id = upload_spooled(notion_token, record) if record.get('upload') else None
+        if upload_id:
+            page = {**page, "children": [file_block(upload_id, record['filename'])]}
+        response = notion_request('POST', '/pages', notion_token, json=page)
+        if response.status_code == 400 and 'file_upload' in response.text and page.get('children'):
+            # Uploads not attached within an hour expire; keep the metadata at least
+            print(f"⚠️ Upload for {record['filename']} expired, replaying without the attachment")
+            page = {key: value for key, value in page.items() if key != 'children'}
+            response = notion_request('POST', '/pages', notion_token, json=page)
+    except (requests.ConnectionError, requests.Timeout, TimeoutError, NotionUnavailableError):
+        return False
+    if response.status_code in RETRYABLE_STATUSES:
+        return False
+    if response.status_code != 200:
+        raise ValueError(response.text)
+    print(f"✅ Replayed spooled page for {record['filename']}")
+    if index_key:
+        get_archive_index().record(*index_key, response.json()['id'])
+    remove_blobs([{'content': record.get('upload')}])
+    return True
+
+def upload_spooled(notion_token, record):
+    """Upload the blob of a spooled record; None if Notion refused the file itself"""
+    content = FileContent.from_meta(record['upload'])
+    try:
+        return upload_file(notion_token, content, record['filename'])
+    except NotionUnavailableError:
+        raise
+    except ArchiveError as e:
+        print(f"⚠️ Upload of {record['filename']} rejected, replaying the page without it: {e.message}")
+        return None
+    finally:
+        content.close()
+
+def get_archive_spool():
+    global archive_spool
+    if archive_spool is None:
+        archive_spool = ArchiveSpool(archive_path('ARCHIVE_SPOOL_DIR'))
+    return archive_spool
+
+@archive.record_once
+def start_spool_replayer(state):
+    """Start replaying spooled page creates once Notion is healthy again"""
+    if ARCHIVE_SPOOL_ENABLED:
+        with state.app.app_context():
+            # The replayer resolves tokens outside any request, so open the vault now
+            get_token_vault()
+        start_replayer(get_archive_spool(), replay_page, notion_healthy, rate=ARCHIVE_SPOOL_REPLAY_RATE)
+
+@archive.route('/archive/stats', methods=['GET'])
+def archive_stats():
+    """Return database ID cache counters and spool depth"""
+    return jsonify({
+        "databaseCache": database_cache.stats(),
+        "spool": get_archive_spool().stats() if ARCHIVE_SPOOL_ENABLED else None
+    }), 200
+
+@archive.route('/archive/spool', methods=['GET'])
+def archive_spool_status():
+    """Return how many page creates are waiting in the spool and how old the oldest is"""
+    if not ARCHIVE_SPOOL_ENABLED:
+        return jsonify({"message": "Archive spool is disabled"}), 404
+    return jsonify(get_archive_spool().stats()), 200
+
+def is_not_found(response):
+    """True if Notion says the object does not exist or is not shared"""
+    if response.status_code == 404:
+        return True
+    try:
+        return response.json().get('code') == 'object_not_found'
+    except ValueError:
+        return False
+
+def get_default_database(notion_token):
+    """Get or create DocuSign Contract Archive database, cached per workspace"""
+    return database_cache.get_or_load(
+        token_key(notion_token),
+        lambda: find_or_create_database(notion_token)
+    )
+
+def find_or_create_database(notion_token):
+    """Search Notion for the archive database, creating it if missing"""
     # Search for "DocuSign Contract Archive" database
-    response = requests.post(
-        'https://api.notion.com/v1/search',
-        headers=headers,
+    response = notion_request(
+        'POST',
+        '/search',
+        notion_token,
         json={
             "query": "DocuSign Contract Archive",
             "filter": {
@@ -164,9 +588,10 @@ def get_default_database(notion_token):
     
     # Create database if not found
     print("🔄 Creating new DocuSign Contract Archive database...")
-    response = requests.post(
-        'https://api.notion.com/v1/databases',
-        headers=headers,
+    response = notion_request(
+        'POST',
+        '/databases',
+        notion_token,
         json={
             "title": [{"type": "text", "text": {"content": "DocuSign Contract Archive"}}],
             "properties": {
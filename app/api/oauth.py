@@ -1,17 +1,47 @@
 from flask import Blueprint, request, jsonify, render_template, current_app, redirect, url_for
 from ..utils.errors import AuthError
-from ..utils.oauth_utils import generate_access_token, generate_refresh_token, verify_token
-from ..supabase_db import store_oauth_state, get_oauth_state
+from ..utils.oauth_utils import generate_access_token, generate_refresh_token, verify_token, token_service
+from ..supabase_db import (
+    store_oauth_state,
+    get_oauth_state,
+    delete_expired_docusign_states,
+    delete_abandoned_oauth_states
+)
+from ..utils.expiry_sweeper import ExpirySweeper
+from ..utils.supabase_client import supabase_clients
 import jwt
 from datetime import datetime, timedelta
 import uuid
 import base64
 import logging
+import os
 from flask_cors import cross_origin
 
 oauth = Blueprint('oauth', __name__)
 logger = logging.getLogger(__name__)
 
+# Background cleanup of expired DocuSign states and abandoned consent attempts.
+# Off unless EXPIRY_SWEEP_ENABLED is set; EXPIRY_SWEEP_INTERVAL=0 also turns it off.
+EXPIRY_SWEEP_ENABLED = os.getenv('EXPIRY_SWEEP_ENABLED', 'false').lower() == 'true'
+EXPIRY_SWEEP_INTERVAL = float(os.getenv('EXPIRY_SWEEP_INTERVAL', 3600))
+OAUTH_STATE_RETENTION = timedelta(hours=float(os.getenv('OAUTH_STATE_RETENTION_HOURS', 24)))
+expiry_sweeper = ExpirySweeper(
+    [
+        ('docusign_states', delete_expired_docusign_states),
+        ('oauth_tokens', lambda limit: delete_abandoned_oauth_states(OAUTH_STATE_RETENTION, limit))
+    ],
+    interval=EXPIRY_SWEEP_INTERVAL,
+    batch_size=int(os.getenv('EXPIRY_SWEEP_BATCH_SIZE', 500)),
+    batch_pause=float(os.getenv('EXPIRY_SWEEP_BATCH_PAUSE', 1.0)),
+    max_batches=int(os.getenv('EXPIRY_SWEEP_MAX_BATCHES', 20))
+)
+
+@oauth.record_once
+def start_expiry_sweeper(state):
+    """Start deleting expired state rows in the background"""
+    if EXPIRY_SWEEP_ENABLED and EXPIRY_SWEEP_INTERVAL > 0:
+        expiry_sweeper.start(wrap=state.app.app_context)
+
 def verify_client_credentials():
     """Verify the client credentials from Authorization header"""
     auth_header = request.headers.get('Authorization')
@@ -140,16 +170,17 @@ def oauth_token():
             raise AuthError("Invalid authorization code")
             
         # Generate tokens like reference implementation
-        access_token = jwt.encode({
+        tokens = token_service()
+        access_token = tokens.issue({
             'type': 'access_token',
             'sub': str(uuid.uuid4()),
             'email': f"{uuid.uuid4()}@test.com",
             'exp': datetime.utcnow() + timedelta(hours=1)
-        }, current_app.config['JWT_SECRET_KEY'])
+        })
         
-        refresh_token = jwt.encode({
+        refresh_token = tokens.issue({
             'type': 'refresh_token'
-        }, current_app.config['JWT_SECRET_KEY'])
+        })
         
         return jsonify({
             'access_token': access_token,
@@ -161,21 +192,18 @@ def oauth_token():
     elif grant_type == 'refresh_token':
         refresh_token = request.form.get('refresh_token')
         try:
-            payload = jwt.decode(
-                refresh_token, 
-                current_app.config['JWT_SECRET_KEY'],
-                algorithms=['HS256']
-            )
+            tokens = token_service()
+            payload = tokens.verify(refresh_token)
             if payload['type'] != 'refresh_token':
                 raise AuthError("Invalid token type")
                 
             # Generate new access token
-            access_token = jwt.encode({
+            access_token = tokens.issue({
                 'type': 'access_token',
                 'sub': str(uuid.uuid4()),
                 'email': f"{uuid.uuid4()}@test.com",
                 'exp': datetime.utcnow() + timedelta(hours=1)
-            }, current_app.config['JWT_SECRET_KEY'])
+            })
             
             return jsonify({
                 'access_token': access_token,
@@ -223,6 +251,16 @@ def oauth_callback():
         "state": state
     })
 
+@oauth.route('/debug/sweeper')
+def debug_sweeper():
+    """Rows removed by the expiry sweeper, per table and for the last pass"""
+    return jsonify(expiry_sweeper.stats())
+
+@oauth.route('/debug/supabase')
+def debug_supabase():
+    """How often this process built or reused its Supabase client"""
+    return jsonify(supabase_clients.stats())
+
 @oauth.route('/debug/state/<state>')
 def debug_state(state):
     """Debug endpoint to check stored state"""
@@ -1,15 +1,77 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for, Response
 import logging
 import json
-from ..utils.vapi_client import create_verification_assistant, wait_for_call_completion
+from ..utils.vapi_client import (
+    create_verification_assistant,
+    wait_for_call_completion,
+    call_deadline,
+    end_call,
+    CallDeadlineExceeded,
+    handle_server_message,
+    warm_verification_assistant,
+    call_poller,
+    VAPI_SERVER_SECRET,
+    VAPI_WARM_ASSISTANT
+)
+import asyncio
+import concurrent.futures
+import hmac
+import os
 import random
-from datetime import datetime, timedelta
+from ..utils.cooldown import create_cooldown_store
+from ..utils.background_loop import background_loop
+from ..utils.verification_jobs import VerificationJobStore
+from ..utils.call_limiter import CallLimiter, LimiterFull
+from ..utils.code_matcher import match_code, message_text
 
 verify = Blueprint('verify', __name__)
 logger = logging.getLogger(__name__)
 
-# Simple in-memory store for recent calls
-recent_calls = {}
+# Per-number cooldown between verification calls. Use the sqlite backend
+# when running several workers so the cooldown holds across processes; its
+# file is COOLDOWN_DB_PATH under DATA_DIR.
+CALL_COOLDOWN_SECONDS = int(os.getenv('CALL_COOLDOWN_SECONDS', 30))
+COOLDOWN_BACKEND = os.getenv('COOLDOWN_BACKEND', 'memory')
+COOLDOWN_MAX_ENTRIES = int(os.getenv('COOLDOWN_MAX_ENTRIES', 10000))
+recent_calls = create_cooldown_store(backend='memory', max_entries=COOLDOWN_MAX_ENTRIES)
+
+# Admission control for outbound calls. Keep VERIFY_MAX_CONCURRENT_CALLS at or
+# below the VAPI account's concurrency limit.
+call_limiter = CallLimiter(
+    max_concurrent=int(os.getenv('VERIFY_MAX_CONCURRENT_CALLS', 10)),
+    max_queued=int(os.getenv('VERIFY_MAX_QUEUED_CALLS', 20)),
+    timeout=float(os.getenv('VERIFY_QUEUE_TIMEOUT', 30))
+)
+
+# Calls hung up because they never reported ending
+deadline_cancelled = 0
+
+# Async verifications ("async": true), kept around for status lookups
+verification_jobs = VerificationJobStore(
+    maxsize=int(os.getenv('VERIFICATION_JOBS_MAX', 1000)),
+    ttl=int(os.getenv('VERIFICATION_JOBS_TTL', 900))
+)
+VERIFICATION_MAX_WAIT = 60
+SSE_KEEPALIVE_SECONDS = 15
+
+def create_recent_calls(config):
+    """Build the configured cooldown store, with its sqlite file under DATA_DIR"""
+    path = os.path.join(config['DATA_DIR'], config['COOLDOWN_DB_PATH'])
+    if COOLDOWN_BACKEND == 'sqlite':
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return create_cooldown_store(backend=COOLDOWN_BACKEND, path=path, max_entries=COOLDOWN_MAX_ENTRIES)
+
+@verify.record_once
+def configure_cooldowns(state):
+    """Replace the import-time memory store with the app's configured one"""
+    global recent_calls
+    recent_calls = create_recent_calls(state.app.config)
+
+@verify.record_once
+def prepare_assistant(state):
+    """Look up or create the shared verification assistant at startup, if VAPI_WARM_ASSISTANT is set"""
+    if VAPI_WARM_ASSISTANT:
+        warm_verification_assistant()
 
 @verify.route('/verifyPhone', methods=['POST'])
 async def verify_phone():
@@ -19,7 +81,8 @@ async def verify_phone():
     Expected request:
     {
         "phoneNumber": "1234567890",
-        "region": "1"
+        "region": "1",
+        "async": false (optional)
     }
     
     Response:
@@ -27,20 +90,84 @@ async def verify_phone():
         "verified": true/false,
         "verifyFailureReason": "reason" (optional)
     }
+    
+    With "async": true or a "Prefer: respond-async" header the call runs in
+    the background and a 202 with a verificationId comes back right away.
+    Follow it with GET /verifyPhone/<id> (long-poll) or
+    GET /verifyPhone/<id>/events (Server-Sent Events).
+    """
+    logger.info("\n=== Phone Verification Request ===")
+    logger.info(f"Headers: {dict(request.headers)}")
+    data = request.get_json(silent=True)
+    body, status = await start_verification(data, request.headers.get('Prefer', ''), url_for('verify.verify_phone'))
+    return jsonify(body), status
+
+async def start_verification(data, prefer, base_url):
+    """
+    Shared by the Flask view and the native ASGI route: returns (body, status).
+    
+    base_url is where /verifyPhone is mounted, used to build the follow-up URLs.
+    """
+    logger.info(f"Request Data: {json.dumps(data, indent=2)}")
+    
+    wants_async = isinstance(data, dict) and data.get('async') is True
+    if wants_async or 'respond-async' in prefer:
+        job = verification_jobs.create()
+        background_loop.submit(run_verification(data, job))
+        logger.info(f"📥 Verification {job.id} running in the background")
+        return {
+            "verificationId": job.id,
+            "status": job.status,
+            "statusUrl": f"{base_url}/{job.id}",
+            "eventsUrl": f"{base_url}/{job.id}/events"
+        }, 202
+    
+    # Run on the shared loop, which is this one when served through app.asgi
+    return await background_loop.run(run_verification(data)), 200
+
+def log_call_end(call, future):
+    """Log a call that failed after the transcript had already decided it"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"⚠️ Call {call.get('id')} ended with an error after it was decided: {future.exception()}")
+
+async def run_verification(data, job=None):
+    """
+    Place a verification call and return the DocuSign response body.
+    
+    If job is given, status and transcript updates are pushed to it as they
+    arrive and the final body is stored on it.
     """
     phone = None  # Initialize phone variable for error handling
+    cooling_down = False
+    body = None
+    
+    # Settled by the local transcript matcher as soon as a user turn decides the call
+    decided = concurrent.futures.Future()
+    transcript = []
+    
+    def on_event(event):
+        if job and not job.done:
+            job.set_status(event.get('status'))
+            job.add_messages(event.get('messages') or [])
+        if event.get('messages'):
+            transcript[:] = event['messages']
+            if not decided.done():
+                verdict, reason = match_code(event['messages'], verification_code)
+                if verdict is not None:
+                    try:
+                        decided.set_result((verdict, reason))
+                    except concurrent.futures.InvalidStateError:
+                        # Settled from the other loop in the meantime
+                        pass
+    
     try:
-        logger.info("\n=== Phone Verification Request ===")
-        logger.info(f"Headers: {dict(request.headers)}")
-        data = request.get_json()
-        logger.info(f"Request Data: {json.dumps(data, indent=2)}")
-        
         # Validate request data
         if not data or 'phoneNumber' not in data:
-            return jsonify({
+            body = {
                 "verified": False,
                 "verifyFailureReason": "Missing phone number"
-            }), 200
+            }
+            return body
             
         # Format phone number
         phone = data['phoneNumber']  # Now phone is defined in the main scope
@@ -50,81 +177,266 @@ async def verify_phone():
         logger.info(f"Formatting phone: {phone} with region {region} -> {formatted_phone}")
         
         if not clean_phone:
-            return jsonify({
+            body = {
                 "verified": False,
                 "verifyFailureReason": "Invalid phone number format"
-            }), 200
+            }
+            return body
         
-        # Check if we've called this number recently (within last 30 seconds)
-        if phone in recent_calls:
-            last_call_time = recent_calls[phone]
-            if datetime.now() - last_call_time < timedelta(seconds=30):
-                return jsonify({
-                    "verified": False,
-                    "verifyFailureReason": "Please wait before trying again"
-                }), 200
-
-        # Store this call attempt
-        recent_calls[phone] = datetime.now()
+        # Check if we've called this number recently, and claim it if not
+        if not recent_calls.acquire(phone, CALL_COOLDOWN_SECONDS):
+            body = {
+                "verified": False,
+                "verifyFailureReason": "Please wait before trying again"
+            }
+            return body
+        cooling_down = True
 
         # Generate verification code
         verification_code = ''.join([str(random.randint(0, 9)) for _ in range(4)])
         logger.info(f"Generated verification code {verification_code}")
         
-        # Create assistant and initiate call
-        call = await create_verification_assistant(verification_code, formatted_phone)
+        # Hold a call slot for the whole call so we stay under VAPI's concurrency quota
+        try:
+            await call_limiter.acquire()
+        except LimiterFull as e:
+            logger.warning(f"⚠️ Rejecting verification for {formatted_phone}: {str(e)}")
+            recent_calls.release(phone)
+            cooling_down = False
+            body = {
+                "verified": False,
+                "verifyFailureReason": "Verification service is busy, please try again shortly"
+            }
+            return body
+        try:
+            # Create assistant and initiate call
+            call = await create_verification_assistant(verification_code, formatted_phone)
+        except Exception:
+            call_limiter.release()
+            raise
         logger.info(f"Call initiated with ID: {call.get('id')}")
+        on_event({'status': call.get('status') or 'queued'})
         
-        # Wait for completion and check result
-        result = await wait_for_call_completion(call.get('id'))
+        # Wait on the background loop so the call keeps its slot until it really
+        # ends, even when the transcript settles it first and we answer early
+        waiting = background_loop.submit(wait_with_deadline(call, on_event))
+        waiting.add_done_callback(lambda _: call_limiter.release())
+        # Shielded: a client that disconnects must not cancel the wait and free the slot early
+        watched = asyncio.shield(asyncio.wrap_future(waiting))
+        await asyncio.wait(
+            [watched, asyncio.wrap_future(decided)],
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        if waiting.done():
+            result = waiting.result()
+            on_event({'messages': result.get('messages', [])})
+        else:
+            # The call runs on to hold its slot; collect how it ends so a late
+            # error is logged rather than left unretrieved
+            watched.add_done_callback(lambda f: log_call_end(call, f))
+            result = {'messages': list(transcript)}
         
         # Log transcript
         logger.info("\n=== Call Transcript ===")
         for message in result.get('messages', []):
-            logger.info(f"{message.get('role', 'unknown')}: {message.get('content', '')}")
+            logger.info(f"{message.get('role', 'unknown')}: {message_text(message)}")
         
-        # Check verification status from analysis summary
-        analysis = result.get('analysis', {}).get('summary')
-        logger.info(f"Call Analysis: {analysis}")
-        
-        # If analysis is a string, try to parse it as JSON
-        if isinstance(analysis, str):
-            try:
-                analysis_data = json.loads(analysis)
-                verified = analysis_data.get('verified', False)
-                verification_reason = analysis_data.get('reason', 'No analysis available')
-            except json.JSONDecodeError:
-                verified = False
-                verification_reason = "Could not parse analysis result"
+        if decided.done():
+            verified, verification_reason = decided.result()
+            logger.info(f"Transcript match: {verified} ({verification_reason})")
         else:
-            verified = analysis.get('verified', False) if analysis else False
-            verification_reason = analysis.get('reason', 'No analysis available') if analysis else 'No analysis available'
+            # The user's answer was unclear; fall back to the analysis summary
+            verified, verification_reason = parse_analysis(result)
 
         # Clean up after verification attempt
-        if phone in recent_calls:
-            del recent_calls[phone]
+        recent_calls.release(phone)
 
         if verified:
             logger.info(f"✅ Phone {formatted_phone} verified with code {verification_code}")
-            return jsonify({
+            body = {
                 "verified": True,
                 "reason": verification_reason,
                 "transcript": result.get('messages', [])
-            }), 200
+            }
         else:
             logger.info(f"❌ Phone {formatted_phone} verification failed: {verification_reason}")
-            return jsonify({
+            body = {
                 "verified": False,
                 "verifyFailureReason": verification_reason,
                 "transcript": result.get('messages', [])
-            }), 200
+            }
+        return body
             
+    except CallDeadlineExceeded as e:
+        logger.error(f"❌ Verification Timeout: {str(e)}")
+        if cooling_down:
+            recent_calls.release(phone)
+        body = {
+            "verified": False,
+            "verifyFailureReason": "Verification call timed out"
+        }
+        return body
     except Exception as e:
         logger.error(f"❌ Verification Error: {str(e)}")
-        # Clean up on error (phone is now defined)
-        if phone and phone in recent_calls:
-            del recent_calls[phone]
-        return jsonify({
+        # Clean up on error, but only a cooldown this request started
+        if cooling_down:
+            recent_calls.release(phone)
+        body = {
             "verified": False,
             "verifyFailureReason": f"Verification service error: {str(e)}"
-        }), 200 
\ No newline at end of file
+        }
+        return body
+    finally:
+        if job:
+            job.finish(body)
+
+async def wait_with_deadline(call, on_event):
+    """
+    Wait for the call to end, hanging it up if it overruns its deadline.
+    
+    Runs on the background loop, so the deadline holds even after an early
+    transcript decision has already answered the request.
+    """
+    global deadline_cancelled
+    try:
+        return await wait_for_call_completion(
+            call.get('id'),
+            call.get('createdAt'),
+            on_event=on_event,
+            deadline=call_deadline(call)
+        )
+    except CallDeadlineExceeded:
+        deadline_cancelled += 1
+        logger.warning(f"⚠️ Call {call.get('id')} overran its deadline, ending it")
+        try:
+            await end_call(call)
+        except Exception as e:
+            logger.error(f"❌ Could not end call {call.get('id')}: {str(e)}")
+        raise
+
+def parse_analysis(result):
+    """Read (verified, reason) from the call's LLM analysis summary"""
+    analysis = result.get('analysis', {}).get('summary')
+    logger.info(f"Call Analysis: {analysis}")
+    
+    # If analysis is a string, try to parse it as JSON
+    if isinstance(analysis, str):
+        try:
+            analysis_data = json.loads(analysis)
+            return analysis_data.get('verified', False), analysis_data.get('reason', 'No analysis available')
+        except json.JSONDecodeError:
+            return False, "Could not parse analysis result"
+    verified = analysis.get('verified', False) if analysis else False
+    verification_reason = analysis.get('reason', 'No analysis available') if analysis else 'No analysis available'
+    return verified, verification_reason
+
+@verify.route('/verifyPhone/<verification_id>', methods=['GET'])
+def verification_status(verification_id):
+    """
+    Long-poll an async verification
+    
+    Holds the request for up to ?wait= seconds (default 25, max 60) until the
+    result is in, then returns the current status and result.
+    """
+    job = verification_jobs.get(verification_id)
+    if not job:
+        return jsonify({"message": "Verification not found"}), 404
+    try:
+        wait = status_wait(request.args.get('wait'))
+    except ValueError:
+        return jsonify({"message": "Invalid wait"}), 400
+    job.wait_done(wait)
+    return jsonify(job.snapshot()), 200
+
+def status_wait(value):
+    """Seconds a status request may be held, from its ?wait= value"""
+    return min(max(float(value if value is not None else 25), 0), VERIFICATION_MAX_WAIT)
+
+def sse_after(last_event_id):
+    """Event ID to resume after, from a Last-Event-ID header"""
+    return int(last_event_id) if last_event_id.isdigit() else 0
+
+def sse_event(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+@verify.route('/verifyPhone/<verification_id>/events', methods=['GET'])
+def verification_events(verification_id):
+    """
+    Stream an async verification as Server-Sent Events
+    
+    Sends status, transcript and a final result event, resuming after
+    Last-Event-ID when the client reconnects.
+    """
+    job = verification_jobs.get(verification_id)
+    if not job:
+        return jsonify({"message": "Verification not found"}), 404
+    after = sse_after(request.headers.get('Last-Event-ID', ''))
+    
+    def stream(after):
+        while True:
+            events = job.wait(after, timeout=SSE_KEEPALIVE_SECONDS)
+            if not events:
+                if job.done:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                yield sse_event(event)
+                after = event['id']
+                if event['type'] == 'result':
+                    return
+    
+    return Response(stream(after), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+async def stream_events(job, after):
+    """The verification_events stream for the ASGI app, waiting on the loop instead of a thread"""
+    while True:
+        events = await job.wait_async(after, timeout=SSE_KEEPALIVE_SECONDS)
+        if not events:
+            if job.done:
+                return
+            yield ": keep-alive\n\n"
+            continue
+        for event in events:
+            yield sse_event(event)
+            after = event['id']
+            if event['type'] == 'result':
+                return
+
+@verify.route('/verify/stats', methods=['GET'])
+def verify_stats():
+    """Return call admission gauges, cooldown and poller counters"""
+    return jsonify({
+        "calls": {**call_limiter.stats(), "deadlineCancelled": deadline_cancelled},
+        "cooldowns": recent_calls.stats(),
+        "poller": call_poller.stats()
+    }), 200
+
+@verify.route('/vapi/webhook', methods=['POST'])
+def vapi_webhook():
+    """
+    Receive VAPI server messages (status-update, end-of-call-report)
+    
+    Wakes any /verifyPhone request waiting on the call in this process.
+    """
+    data = request.get_json(silent=True) or {}
+    body, status = receive_server_message(data, request.headers.get('X-Vapi-Secret', ''))
+    return jsonify(body), status
+
+def receive_server_message(data, secret):
+    """Check the shared secret and route a VAPI server message: returns (body, status)"""
+    if not VAPI_SERVER_SECRET:
+        # Without a secret anyone could post a fake end-of-call report
+        logger.error("❌ VAPI webhook called but VAPI_SERVER_SECRET is not set")
+        return {"message": "Webhook is not configured"}, 401
+    if not hmac.compare_digest(secret.encode('utf-8'), VAPI_SERVER_SECRET.encode('utf-8')):
+        logger.error("❌ VAPI webhook with invalid secret")
+        return {"message": "Invalid secret"}, 401
+    
+    message = data.get('message') or {}
+    woken = handle_server_message(message)
+    logger.info(f"VAPI {message.get('type')} for call {(message.get('call') or {}).get('id')}, woke {woken} waiter(s)")
+    return {}, 200
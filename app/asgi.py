@@ -0,0 +1,322 @@
+"""
+ASGI entry point.
+
+Serve with any ASGI server, e.g. `hypercorn app.asgi:application` or
+`python run.py`. The hot async routes (/api/verifyPhone, its long-poll
+status and SSE events, and the VAPI webhook) run natively on the server's
+event loop, which also becomes the shared background loop, so every
+verification in the worker shares one loop and one set of pooled clients,
+and waiting clients hold no threads. Everything else is handed to the
+Flask app in a thread pool.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from . import create_app
+from .api.verify import (
+    start_verification,
+    receive_server_message,
+    verification_jobs,
+    status_wait,
+    sse_after,
+    stream_events
+)
+from .utils.background_loop import background_loop
+from .utils.http_clients import aclose_http_clients
+from .utils.supabase_client import supabase_clients
+
+logger = logging.getLogger(__name__)
+
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 32))
+
+
+class RequestBody(io.RawIOBase):
+    """wsgi.input that pulls body chunks from the ASGI receive channel on demand"""
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = b''
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                self._more = False
+                break
+            self._buffer = message.get('body', b'')
+            self._more = message.get('more_body', False)
+        count = min(len(b), len(self._buffer))
+        b[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+
+class WsgiBridge:
+    """
+    Run a WSGI app for ASGI requests on a thread pool.
+
+    The request body and the response are streamed in both directions, so
+    large archive uploads aren't buffered and SSE responses flush per event.
+    """
+
+    def __init__(self, wsgi_app, max_workers=ASGI_WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wsgi')
+
+    def environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+                key = name
+            else:
+                key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        body = io.BufferedReader(RequestBody(receive, loop))
+        environ = self.environ(scope, body)
+
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run():
+            response = {}
+
+            def start_response(status, headers, exc_info=None):
+                # PEP 3333: an error after headers went out can't change them,
+                # so re-raise it; before that, the error response replaces them
+                if exc_info:
+                    try:
+                        if response.get('started'):
+                            raise exc_info[1].with_traceback(exc_info[2])
+                    finally:
+                        exc_info = None
+                elif 'status' in response:
+                    raise AssertionError("start_response called twice without exc_info")
+                response['status'] = int(status.split(' ', 1)[0])
+                response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+                return lambda data: send_body(data)
+
+            def send_body(data):
+                if not response.get('started'):
+                    send_sync({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+                    response['started'] = True
+                if data:
+                    send_sync({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+            result = self.wsgi_app(environ, start_response)
+            try:
+                for chunk in result:
+                    send_body(chunk)
+                send_body(b'')
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            send_sync({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+        await loop.run_in_executor(self.executor, run)
+
+
+async def read_json(receive):
+    body = b''
+    more = True
+    while more:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        more = message.get('more_body', False)
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+async def send_json(send, body, status):
+    payload = json.dumps(body).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode('latin-1')),
+            # Same CORS policy create_app() sets through flask-cors
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+def header(scope, name):
+    name = name.lower().encode('latin-1')
+    return ', '.join(v.decode('latin-1') for k, v in scope.get('headers', []) if k == name)
+
+
+def query_param(scope, name):
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(name)
+    return values[0] if values else None
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def verify_phone(scope, receive, send):
+    logger.info("\n=== Phone Verification Request ===")
+    logger.info(f"Headers: {dict((k.decode('latin-1'), v.decode('latin-1')) for k, v in scope.get('headers', []))}")
+    data = await read_json(receive)
+    base_url = f"{scope.get('root_path', '')}/api/verifyPhone"
+    body, status = await start_verification(data, header(scope, 'Prefer'), base_url)
+    await send_json(send, body, status)
+
+
+async def verification_status(scope, receive, send, verification_id):
+    job = verification_jobs.get(verification_id)
+    if not job:
+        return await send_json(send, {"message": "Verification not found"}, 404)
+    try:
+        wait = status_wait(query_param(scope, 'wait'))
+    except ValueError:
+        return await send_json(send, {"message": "Invalid wait"}, 400)
+    await job.wait_done_async(wait)
+    await send_json(send, job.snapshot(), 200)
+
+
+async def verification_events(scope, receive, send, verification_id):
+    job = verification_jobs.get(verification_id)
+    if not job:
+        return await send_json(send, {"message": "Verification not found"}, 404)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    stream = stream_events(job, sse_after(header(scope, 'Last-Event-ID')))
+    try:
+        async for chunk in stream:
+            if disconnected.done():
+                return
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        disconnected.cancel()
+        await stream.aclose()
+
+
+async def vapi_webhook(scope, receive, send):
+    data = await read_json(receive)
+    body, status = receive_server_message(data if isinstance(data, dict) else {}, header(scope, 'X-Vapi-Secret'))
+    await send_json(send, body, status)
+
+
+class AsgiApp:
+    """ASGI app: native async routes first, the Flask app for everything else"""
+
+    routes = {
+        ('POST', '/api/verifyPhone'): verify_phone,
+        ('POST', '/api/vapi/webhook'): vapi_webhook
+    }
+    # Routes with a path parameter, passed to the handler
+    param_routes = [
+        ('GET', re.compile(r'/api/verifyPhone/([^/]+)'), verification_status),
+        ('GET', re.compile(r'/api/verifyPhone/([^/]+)/events'), verification_events)
+    ]
+
+    def __init__(self, app_factory=create_app):
+        self.app_factory = app_factory
+        self.flask_app = None
+        self.wsgi = None
+
+    def startup(self):
+        """Adopt the server's loop as the shared loop, then build the Flask app"""
+        if self.flask_app is not None:
+            return
+        if not background_loop.adopt(asyncio.get_running_loop()):
+            logger.warning("Background loop already running; async routes will hop to it")
+        self.flask_app = self.app_factory()
+        self.wsgi = WsgiBridge(self.flask_app)
+
+    async def shutdown(self):
+        await aclose_http_clients()
+        supabase_clients.close()
+        if self.wsgi is not None:
+            self.wsgi.executor.shutdown(wait=False)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    self.startup()
+                except Exception as e:
+                    logger.error(f"❌ Startup failed: {str(e)}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        # Servers that skip lifespan still get a working app
+        self.startup()
+        if scope['type'] != 'http':
+            return
+        handler = self.routes.get((scope['method'], scope['path']))
+        if handler is not None:
+            return await handler(scope, receive, send)
+        for method, pattern, handler in self.param_routes:
+            match = pattern.fullmatch(scope['path'])
+            if match and scope['method'] == method:
+                return await handler(scope, receive, send, *match.groups())
+        await self.wsgi(scope, receive, send)
+
+
+def create_asgi_app(app_factory=create_app):
+    return AsgiApp(app_factory)
+
+
+application = create_asgi_app()
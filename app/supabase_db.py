@@ -1,19 +1,73 @@
-from supabase import create_client
+from .utils.supabase_client import supabase_clients
+from .utils.ttl_cache import TTLCache
+from .utils.storage import create_storage, OAUTH_TOKEN_COLUMNS
 from datetime import datetime, timedelta
 import os
+import threading
 from typing import Optional, Dict
-from flask import current_app
-import uuid
+from flask import current_app, has_app_context
+
+# Where state lives: "supabase" (default) or "sqlite" for single-node
+# deployments and tests, which keeps every lookup in-process. The sqlite
+# file is STORAGE_SQLITE_PATH under DATA_DIR once init_storage() has run.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase')
+storage_sqlite_path = os.getenv('STORAGE_SQLITE_PATH', 'docuvoice.db')
+storage = None
+storage_lock = threading.Lock()
+
+# oauth_tokens rows by state. One consent flow reads the same state several
+# times, so rows are cached briefly; states with no row are cached for less
+# time so a row written by another worker shows up soon.
+OAUTH_CACHE_TTL = int(os.getenv('OAUTH_CACHE_TTL', 300))
+OAUTH_NEGATIVE_CACHE_TTL = int(os.getenv('OAUTH_NEGATIVE_CACHE_TTL', 5))
+oauth_cache = TTLCache(
+    maxsize=int(os.getenv('OAUTH_CACHE_SIZE', 1024)),
+    ttl=OAUTH_CACHE_TTL
+)
+# Cached in place of a row for states that have none
+MISSING = object()
 
 def get_supabase_client():
-    """Get Supabase client when needed"""
-    supabase_url = current_app.config.get('SUPABASE_URL') or os.getenv('SUPABASE_URL')
-    supabase_key = current_app.config.get('SUPABASE_KEY') or os.getenv('SUPABASE_KEY')
-    
+    """Get the process-wide Supabase client, built on first use"""
+    config = current_app.config if has_app_context() else {}
+    supabase_url = config.get('SUPABASE_URL') or os.getenv('SUPABASE_URL')
+    supabase_key = config.get('SUPABASE_KEY') or os.getenv('SUPABASE_KEY')
+
     if not supabase_url or not supabase_key:
         raise ValueError("Supabase URL and Key are required")
-        
-    return create_client(supabase_url, supabase_key)
+
+    return supabase_clients.get(supabase_url, supabase_key)
+
+def init_storage(app):
+    """Resolve the sqlite storage file under the app's DATA_DIR; the backend is built on first use"""
+    global storage_sqlite_path, storage
+    with storage_lock:
+        storage_sqlite_path = os.path.join(app.config['DATA_DIR'], app.config['STORAGE_SQLITE_PATH'])
+        storage = None
+
+def get_storage():
+    """Return the configured storage backend, creating it on first use"""
+    global storage
+    with storage_lock:
+        if storage is None:
+            if STORAGE_BACKEND == 'sqlite':
+                os.makedirs(os.path.dirname(storage_sqlite_path) or '.', exist_ok=True)
+            storage = create_storage(STORAGE_BACKEND, storage_sqlite_path, get_client=get_supabase_client)
+        return storage
+
+def get_oauth_row(state: str) -> Optional[Dict]:
+    """Read-through cached lookup of the oauth_tokens row for a state"""
+    cached = oauth_cache.get(state)
+    if cached is MISSING:
+        return None
+    if cached is not None:
+        return cached
+    row = get_storage().get_oauth_row(state)
+    if not row:
+        oauth_cache.set(state, MISSING, ttl=OAUTH_NEGATIVE_CACHE_TTL)
+        return None
+    oauth_cache.set(state, row)
+    return row
 
 def store_oauth_token(
     state: str,
@@ -21,8 +75,7 @@ def store_oauth_token(
     workspace_id: Optional[str] = None,
     workspace_name: Optional[str] = None
 ) -> Dict:
-    """Store OAuth token in Supabase"""
-    supabase = get_supabase_client()
+    """Store OAuth token"""
     data = {
         'state': state,
         'notion_token': notion_token,
@@ -30,16 +83,15 @@ def store_oauth_token(
         'workspace_name': workspace_name,
         'created_at': datetime.utcnow().isoformat()
     }
-    return supabase.table('oauth_tokens').insert(data).execute()
+    try:
+        return get_storage().insert_oauth_row(data)
+    finally:
+        # The state may now have more than one row; re-read rather than guess
+        oauth_cache.invalidate(state)
 
 def get_oauth_token(state: str) -> Optional[Dict]:
-    """Get OAuth token from Supabase"""
-    supabase = get_supabase_client()
-    response = supabase.table('oauth_tokens')\
-        .select('*')\
-        .eq('state', state)\
-        .execute()
-    return response.data[0] if response.data else None
+    """Get OAuth token"""
+    return get_oauth_row(state)
 
 # Only used in these specific OAuth flows:
 # 1. When storing Notion token during OAuth
@@ -47,30 +99,40 @@ def get_oauth_token(state: str) -> Optional[Dict]:
 # 3. When retrieving tokens during verification
 
 def store_docusign_state(state: str, params: Dict) -> Dict:
-    """Store DocuSign state in Supabase"""
+    """Store DocuSign state"""
     try:
-        supabase = get_supabase_client()
         data = {
             'state': state,
             'params': params,
             'created_at': datetime.utcnow().isoformat(),
             'expires_at': (datetime.utcnow() + timedelta(hours=1)).isoformat()
         }
-        
-        result = supabase.table('docusign_states').insert(data).execute()
-        return result
-        
+
+        return get_storage().insert_docusign_state(data)
+
     except Exception as e:
         print(f"Error type: {type(e)}")
         raise
 
 def get_docusign_state(state: str) -> Optional[Dict]:
-    """Get DocuSign state from Supabase"""
-    response = get_supabase_client().table('docusign_states')\
-        .select('*')\
-        .eq('state', state)\
-        .execute()
-    return response.data[0] if response.data else None
+    """Get DocuSign state"""
+    return get_storage().get_docusign_state(state)
+
+def delete_expired_docusign_states(limit: int) -> int:
+    """Delete up to limit docusign_states rows past expires_at; returns how many"""
+    return get_storage().delete_expired_docusign_states(datetime.utcnow().isoformat(), limit)
+
+def delete_abandoned_oauth_states(older_than: timedelta, limit: int) -> int:
+    """
+    Delete up to limit oauth_tokens rows for consent attempts that never got a token.
+
+    Rows with a notion_token are installations and are kept.
+    """
+    cutoff = (datetime.utcnow() - older_than).isoformat()
+    count, states = get_storage().delete_abandoned_oauth_states(cutoff, limit)
+    for state in states:
+        oauth_cache.invalidate(state)
+    return count
 
 def get_oauth_token_by_code(code):
     """
@@ -78,18 +140,14 @@ def get_oauth_token_by_code(code):
     Keeping function name for compatibility.
     """
     try:
-        supabase = get_supabase_client()
-        token_response = supabase.table('oauth_tokens')\
-            .select("*")\
-            .eq('state', code)\
-            .execute()
-        
-        if not token_response.data:
+        token = get_oauth_row(code)
+
+        if not token:
             print("❌ No token found for state:", code)
             return None
-            
-        return token_response.data[0]
-        
+
+        return token
+
     except Exception as e:
         print("❌ Error getting token:", str(e))
         return None
@@ -97,109 +155,50 @@ def get_oauth_token_by_code(code):
 def update_last_used(state: str):
     """Update the last_used timestamp for an installation"""
     try:
-        supabase = get_supabase_client()
-        return supabase.table('oauth_tokens')\
-            .update({'last_used': datetime.utcnow().isoformat()})\
-            .eq('state', state)\
-            .execute()
+        oauth_cache.invalidate(state)
+        get_storage().update_last_used(state, datetime.utcnow().isoformat())
     except Exception as e:
         print(f"Error updating last_used: {str(e)}")
 
 def store_verification_code(phone, code):
     """Store a new verification code"""
     expires_at = datetime.utcnow() + timedelta(minutes=10)
-    
-    query = """
-    INSERT INTO verification_codes (phone, code, expires_at)
-    VALUES (:phone, :code, :expires_at)
-    """
-    
-    current_app.db.execute(query, {
-        'phone': phone,
-        'code': code,
-        'expires_at': expires_at
-    })
+    get_storage().store_verification_code(phone, code, expires_at.isoformat())
 
 def verify_code(phone, code):
     """Verify a code and return True if valid"""
-    query = """
-    SELECT id FROM verification_codes 
-    WHERE phone = :phone 
-    AND code = :code 
-    AND expires_at > NOW() 
-    AND verified = FALSE
-    """
-    
-    result = current_app.db.execute(query, {
-        'phone': phone,
-        'code': code
-    }).fetchone()
-    
-    if result:
-        # Mark code as verified
-        current_app.db.execute(
-            "UPDATE verification_codes SET verified = TRUE WHERE id = :id",
-            {'id': result[0]}
-        )
-        return True
-    return False
+    return get_storage().verify_code(phone, code, datetime.utcnow().isoformat())
 
 def create_or_get_user(phone):
     """Get existing user or create new one"""
-    query = """
-    INSERT INTO users (id, phone)
-    VALUES (:id, :phone)
-    ON CONFLICT (phone) DO UPDATE
-    SET last_login = NOW()
-    RETURNING id
-    """
-    
-    user_id = str(uuid.uuid4())
-    result = current_app.db.execute(query, {
-        'id': user_id,
-        'phone': phone
-    }).fetchone()
-    
-    return result[0]
+    return get_storage().create_or_get_user(phone, datetime.utcnow().isoformat())
 
 def store_user_session(user_id, refresh_token):
     """Store a new user session"""
     expires_at = datetime.utcnow() + timedelta(days=30)
-    
-    query = """
-    INSERT INTO user_sessions (user_id, refresh_token, expires_at)
-    VALUES (:user_id, :refresh_token, :expires_at)
-    """
-    
-    current_app.db.execute(query, {
-        'user_id': user_id,
-        'refresh_token': refresh_token,
-        'expires_at': expires_at
-    })
+    get_storage().store_user_session(user_id, refresh_token, expires_at.isoformat())
 
 def store_oauth_state(state, data):
     """Store OAuth state"""
-    supabase = get_supabase_client()
-    return supabase.table('oauth_tokens').insert({
+    oauth_cache.invalidate(state)
+    row = get_storage().insert_oauth_row({
         'state': state,
         'redirect_uri': data['redirect_uri'],
         # Don't try to store docusign_state yet
         'created_at': datetime.utcnow().isoformat()
-    }).execute()
+    })
+    # A fresh state has exactly this row, so the next lookup can skip the query
+    oauth_cache.set(state, {column: row.get(column) for column in OAUTH_TOKEN_COLUMNS})
+    return row
 
 def get_oauth_state(state):
     """Get OAuth state"""
-    supabase = get_supabase_client()
-    response = supabase.table('oauth_tokens')\
-        .select('*')\
-        .eq('state', state)\
-        .execute()
-    if not response.data:
+    data = get_oauth_row(state)
+    if not data:
         return None
-    
-    data = response.data[0]
+
     return {
         'redirect_uri': data.get('redirect_uri'),
         # Return None for docusign_state
         'docusign_state': None
-    } 
\ No newline at end of file
+    }
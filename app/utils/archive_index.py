@@ -0,0 +1,121 @@
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived_files (
+    workspace TEXT NOT NULL,
+    source TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (workspace, source, sha256)
+);
+CREATE INDEX IF NOT EXISTS archived_files_created_at ON archived_files (created_at);
+"""
+
+
+class ArchiveIndex:
+    """
+    Persistent map of (workspace, source, content hash) -> Notion page ID.
+
+    Entries expire after ttl seconds and the table is trimmed to max_entries,
+    oldest first, every prune_every writes. A file being archived is claimed
+    first with an empty page ID, so a redelivery that arrives mid-create
+    sees it in progress instead of creating a second page.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=100000, prune_every=100):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def lookup(self, workspace, source, sha256):
+        """Return the page ID already created for this file, or None"""
+        row = self._connect().execute(
+            "SELECT page_id FROM archived_files WHERE workspace = ? AND source = ? AND sha256 = ? "
+            "AND page_id != '' AND created_at > ?",
+            (workspace, source, sha256, time.time() - self.ttl)
+        ).fetchone()
+        return row[0] if row else None
+
+    def claim(self, workspace, source, sha256, claim_ttl=300):
+        """
+        Claim a file before archiving it.
+
+        Returns (True, None) if the caller should create the page and then
+        record() or release() it, (False, page_id) if it is already archived,
+        and (False, None) while another claim younger than claim_ttl is in
+        progress.
+        """
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT page_id, created_at FROM archived_files WHERE workspace = ? AND source = ? AND sha256 = ?",
+                (workspace, source, sha256)
+            ).fetchone()
+            if row and row[0] and row[1] > now - self.ttl:
+                claimed, page_id = False, row[0]
+            elif row and not row[0] and row[1] > now - claim_ttl:
+                claimed, page_id = False, None
+            else:
+                db.execute(
+                    "INSERT OR REPLACE INTO archived_files (workspace, source, sha256, page_id, created_at) "
+                    "VALUES (?, ?, ?, '', ?)",
+                    (workspace, source, sha256, now)
+                )
+                claimed, page_id = True, None
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return claimed, page_id
+
+    def release(self, workspace, source, sha256):
+        """Drop an unfinished claim, so a later delivery can archive the file"""
+        self._connect().execute(
+            "DELETE FROM archived_files WHERE workspace = ? AND source = ? AND sha256 = ? AND page_id = ''",
+            (workspace, source, sha256)
+        )
+
+    def record(self, workspace, source, sha256, page_id):
+        """Remember that this file was archived as page_id"""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO archived_files (workspace, source, sha256, page_id, created_at) VALUES (?, ?, ?, ?, ?)",
+            (workspace, source, sha256, page_id, time.time())
+        )
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Drop expired entries and trim the table to max_entries"""
+        db = self._connect()
+        expired = db.execute(
+            "DELETE FROM archived_files WHERE created_at <= ?",
+            (time.time() - self.ttl,)
+        ).rowcount
+        trimmed = db.execute(
+            "DELETE FROM archived_files WHERE rowid IN ("
+            "SELECT rowid FROM archived_files ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        return expired + trimmed
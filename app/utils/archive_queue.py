@@ -0,0 +1,167 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    workspace TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS archive_jobs_ready ON archive_jobs (status, next_attempt_at);
+"""
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+PARTIAL = 'partial'
+FAILED = 'failed'
+
+
+class ArchiveQueue:
+    """Persistent SQLite-backed queue of archive jobs"""
+
+    def __init__(self, path, max_attempts=5):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        with self._connect() as db:
+            columns = [row['name'] for row in db.execute("PRAGMA table_info(archive_jobs)")]
+            if 'notion_token' in columns:
+                # Queues written before jobs kept a workspace reference: drop the raw
+                # tokens; jobs still pending fail once, as their token can't be resolved
+                db.execute("ALTER TABLE archive_jobs RENAME COLUMN notion_token TO workspace")
+                db.execute("UPDATE archive_jobs SET workspace = ''")
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def enqueue(self, workspace, payload):
+        """
+        Store a job and return its ID.
+
+        workspace is a reference the worker resolves to a Notion token when it
+        claims the job (see TokenVault); the token itself is never stored here.
+        """
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO archive_jobs (id, status, workspace, payload, next_attempt_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, workspace, json.dumps(payload), now, now, now)
+        )
+        self._wakeup.set()
+        return job_id
+
+    def claim(self):
+        """Atomically take the next ready job, or return None"""
+        db = self._connect()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                "SELECT * FROM archive_jobs WHERE status = ? AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT 1",
+                (QUEUED, now)
+            ).fetchone()
+            if row:
+                db.execute(
+                    "UPDATE archive_jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (RUNNING, now, row['id'])
+                )
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        if not row:
+            return None
+        job = dict(row)
+        job['attempts'] += 1
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def finish(self, job_id, status, result):
+        """Record the final outcome of a job and drop its payload"""
+        self._connect().execute(
+            "UPDATE archive_jobs SET status = ?, result = ?, payload = '{}', updated_at = ? WHERE id = ?",
+            (status, json.dumps(result), time.time(), job_id)
+        )
+
+    def retry(self, job_id, payload, result, delay):
+        """Put a job back in the queue with the work still left to do"""
+        self._connect().execute(
+            "UPDATE archive_jobs SET status = ?, payload = ?, result = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+            (QUEUED, json.dumps(payload), json.dumps(result), time.time() + delay, time.time(), job_id)
+        )
+
+    def recover(self, stale_after=600):
+        """Requeue jobs left running by a worker that died mid-job"""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE archive_jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+            (QUEUED, now, RUNNING, now - stale_after)
+        )
+
+    def get(self, job_id):
+        """Return the public view of a job, or None"""
+        row = self._connect().execute(
+            "SELECT id, status, result, attempts, created_at, updated_at FROM archive_jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def wait(self, timeout):
+        """Sleep until a job is enqueued or timeout passes"""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+
+def start_workers(queue, handle_job, count, poll_interval=1.0):
+    """Start daemon threads that drain queue by calling handle_job(job)"""
+    def run():
+        while True:
+            try:
+                job = queue.claim()
+            except sqlite3.Error as e:
+                print(f"❌ Archive queue error: {str(e)}")
+                job = None
+            if job is None:
+                queue.wait(poll_interval)
+                continue
+            try:
+                handle_job(job)
+            except Exception as e:
+                print(f"❌ Archive job {job['id']} crashed: {str(e)}")
+                result = {"message": f"Something went wrong: {str(e)}"}
+                if job['attempts'] >= queue.max_attempts:
+                    queue.finish(job['id'], FAILED, result)
+                else:
+                    queue.retry(job['id'], job['payload'], result, delay=poll_interval)
+
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(target=run, name=f'archive-worker-{i}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
@@ -0,0 +1,303 @@
+import fcntl
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+SEGMENT_PREFIX = 'spool-'
+SEGMENT_SUFFIX = '.log'
+CURSOR_FILE = 'cursor.json'
+DEAD_LETTER_FILE = 'dead.log'
+BLOB_DIR = 'blobs'
+LOCK_FILE = 'spool.lock'
+REPLAYER_LOCK_FILE = 'replayer.lock'
+
+
+class ArchiveSpool:
+    """
+    Append-only, segmented on-disk spool of Notion writes that could not be made.
+
+    Records are JSON lines. Concurrent appenders share fsyncs (group commit):
+    whoever syncs first makes every record written so far durable. Segments
+    roll over at segment_max_bytes; a cursor file tracks how far the replayer
+    got, and fully replayed segments are deleted. File content that could not
+    be uploaded yet is kept next to the segments as blobs.
+
+    Several worker processes can share one directory: appends, rolls and
+    seals hold an flock on spool.lock, and every process writes to the newest
+    segment on disk. Only the process holding replayer.lock replays.
+
+    With read_only, nothing is created or locked; only segments(),
+    pending() and stats() may be used, e.g. to inspect a live spool.
+    """
+
+    def __init__(self, directory, segment_max_bytes=4 * 1024 * 1024, read_only=False):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+        self._replayer_lock = None
+        if read_only:
+            return
+        os.makedirs(os.path.join(directory, BLOB_DIR), exist_ok=True)
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), 'ab')
+        with self._locked():
+            segments = self.segments()
+            self._segment = segments[-1] if segments else self._segment_name(1)
+            self._file = open(os.path.join(directory, self._segment), 'a+b')
+
+    @contextmanager
+    def _locked(self):
+        """Hold the in-process lock and the directory's flock"""
+        with self._lock:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _follow(self):
+        # Caller holds _locked(): switch to the newest segment if another process
+        # rolled, and catch up with what other processes appended to it
+        newest = self.segments()[-1]
+        if newest != self._segment:
+            self._file.close()
+            self._segment = newest
+            self._file = open(os.path.join(self.directory, self._segment), 'a+b')
+        end = self._file.seek(0, os.SEEK_END)
+        if end and os.pread(self._file.fileno(), 1, end - 1) != b'\n':
+            # A writer died mid-record; end its partial line so the next record
+            # is not glued onto it
+            self._file.write(b'\n')
+
+    def _segment_name(self, number):
+        return f"{SEGMENT_PREFIX}{number:012d}{SEGMENT_SUFFIX}"
+
+    def _segment_number(self, name):
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+    def segments(self):
+        """Segment file names, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name for name in names
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def append(self, record):
+        """Durably append a record, returning once it has been fsynced"""
+        line = json.dumps({**record, 'spooled_at': time.time()}).encode('utf-8') + b'\n'
+        with self._locked():
+            self._follow()
+            if self._file.tell() + len(line) > self.segment_max_bytes and self._file.tell() > 0:
+                self._roll()
+            self._file.write(line)
+            self._file.flush()
+            self._written += 1
+            mine = self._written
+        self._sync(mine)
+
+    def _sync(self, upto):
+        with self._sync_lock:
+            if self._synced >= upto:
+                return
+            with self._lock:
+                target = self._written
+                fd = os.dup(self._file.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._synced = target
+
+    def _roll(self):
+        # Caller holds _locked()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._segment = self._segment_name(self._segment_number(self._segment) + 1)
+        self._file = open(os.path.join(self.directory, self._segment), 'a+b')
+
+    def seal(self):
+        """Start a new segment so the current one can be replayed"""
+        with self._locked():
+            self._follow()
+            if self._file.tell() > 0:
+                self._roll()
+
+    def sealed_segments(self):
+        """Segments no process appends to any more, oldest first"""
+        with self._locked():
+            return self.segments()[:-1]
+
+    def acquire_replayer(self):
+        """True if this process is (or just became) the directory's only replayer"""
+        if self._replayer_lock is None:
+            lock = open(os.path.join(self.directory, REPLAYER_LOCK_FILE), 'ab')
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                return False
+            self._replayer_lock = lock
+        return True
+
+    def read_cursor(self):
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'segment': None, 'offset': 0}
+
+    def write_cursor(self, segment, offset):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump({'segment': segment, 'offset': offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+    def pending_lines(self, segment):
+        """Yield (offset after line, raw line) for unreplayed complete lines in a segment"""
+        cursor = self.read_cursor()
+        offset = cursor['offset'] if cursor['segment'] == segment else 0
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                if line.endswith(b'\n'):
+                    yield offset, line
+
+    def pending(self, segment):
+        """Yield (offset after record, record) for unreplayed records, skipping unreadable lines"""
+        for offset, line in self.pending_lines(segment):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            yield offset, record
+
+    def blob_path(self):
+        """Fresh path for a blob a spooled record will reference"""
+        return os.path.join(self.directory, BLOB_DIR, str(uuid.uuid4()))
+
+    def remove(self, segment):
+        os.remove(os.path.join(self.directory, segment))
+
+    def dead_letter(self, record, reason, line=None):
+        """Keep a record that can never be replayed, with its raw line, for manual follow-up"""
+        entry = {**(record if isinstance(record, dict) else {}), 'reason': reason}
+        if line is not None:
+            entry['raw'] = line.decode('utf-8', 'replace').rstrip('\n')
+        with open(os.path.join(self.directory, DEAD_LETTER_FILE), 'ab') as f:
+            f.write(json.dumps(entry).encode('utf-8') + b'\n')
+
+    def stats(self):
+        """Depth (unreplayed records), age of the oldest one and size on disk"""
+        depth = 0
+        oldest = None
+        size = 0
+        segments = self.segments()
+        for segment in segments:
+            size += os.path.getsize(os.path.join(self.directory, segment))
+            for _, record in self.pending(segment):
+                depth += 1
+                if oldest is None:
+                    oldest = record.get('spooled_at')
+        return {
+            'depth': depth,
+            'oldestAgeSeconds': round(time.time() - oldest, 1) if oldest else None,
+            'segments': len(segments),
+            'bytes': size
+        }
+
+
+def start_replayer(spool, replay, healthy, rate=1.0, idle_interval=5.0, max_backoff=300.0, max_attempts=5):
+    """
+    Start a daemon thread that drains the spool oldest first.
+
+    healthy(record) -> bool gates replay (e.g. a Notion health check);
+    replay(record) returns True when done, False to retry later, or raises
+    ValueError for records that can never succeed. Lines that do not parse
+    are dead-lettered straight away, and a record whose replay raises
+    anything else is retried with backoff and dead-lettered after
+    max_attempts, so one bad record cannot block the ones behind it. At
+    most rate records are replayed per second. When several processes share
+    the spool, only the one holding the replayer lock drains it; the others
+    keep trying to take over.
+    """
+    # Failed attempts at the record at the head of the spool, by (segment, offset)
+    failures = {}
+
+    def run():
+        backoff = idle_interval
+        while True:
+            if not spool.acquire_replayer():
+                time.sleep(idle_interval)
+                continue
+            try:
+                if not spool.sealed_segments():
+                    spool.seal()
+                progressed = drain(backoff)
+            except Exception as e:
+                print(f"❌ Spool replay error: {str(e)}")
+                progressed = False
+            if progressed:
+                backoff = idle_interval
+            else:
+                time.sleep(backoff)
+                backoff = min(max_backoff, backoff * 2) if spool.stats()['depth'] else idle_interval
+
+    def drain(backoff):
+        progressed = False
+        for segment in spool.sealed_segments():
+            checked = False
+            for offset, line in spool.pending_lines(segment):
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    spool.dead_letter(None, f"Unreadable record: {str(e)}", line)
+                    spool.write_cursor(segment, offset)
+                    continue
+                try:
+                    if not checked:
+                        if not healthy(record):
+                            print(f"⏸️ Notion unhealthy, spool replay paused for {backoff:.0f}s")
+                            return progressed
+                        checked = True
+                    if not replay(record):
+                        return progressed
+                except ValueError as e:
+                    spool.dead_letter(record, str(e), line)
+                except Exception as e:
+                    attempts = failures.get((segment, offset), 0) + 1
+                    if attempts < max_attempts:
+                        failures[(segment, offset)] = attempts
+                        print(f"❌ Spool replay failed ({attempts}/{max_attempts}): {str(e)}")
+                        return progressed
+                    spool.dead_letter(record, f"Failed {attempts} times: {str(e)}", line)
+                failures.clear()
+                spool.write_cursor(segment, offset)
+                progressed = True
+                time.sleep(1.0 / rate)
+            spool.remove(segment)
+        return progressed
+
+    thread = threading.Thread(target=run, name='archive-spool-replayer', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    # python -m app.utils.archive_spool [spool dir]
+    # Defaults to the app's spool (ARCHIVE_SPOOL_DIR under DATA_DIR) and only reads it
+    from config import Config
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(Config.DATA_DIR, Config.ARCHIVE_SPOOL_DIR)
+    print(json.dumps(ArchiveSpool(directory, read_only=True).stats(), indent=2))
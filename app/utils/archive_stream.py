@@ -0,0 +1,269 @@
+import base64
+import codecs
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+
+# Decoded files smaller than this stay in memory, larger ones roll to disk
+SPOOL_MAX_MEMORY = int(os.getenv('ARCHIVE_SPOOL_MAX_MEMORY', 1024 * 1024))
+READ_CHUNK_SIZE = 64 * 1024
+
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+WHITESPACE = ' \t\r\n'
+
+
+class FileContent:
+    """Decoded bytes of one archived file, in a BytesIO or a file on disk"""
+
+    def __init__(self, fileobj, size, sha256):
+        self.fileobj = fileobj
+        self.size = size
+        self.sha256 = sha256
+
+    @classmethod
+    def from_base64(cls, text):
+        """Build content from an already-loaded base64 string"""
+        writer = ContentWriter()
+        writer.write(text)
+        return writer.finish()
+
+    @classmethod
+    def from_meta(cls, meta):
+        """Reopen content saved by persist(), or decode a legacy base64 string"""
+        if isinstance(meta, str):
+            return cls.from_base64(meta)
+        return cls(open(meta['path'], 'rb'), meta['size'], meta['sha256'])
+
+    def open(self):
+        """Return the underlying binary file positioned at the start"""
+        self.fileobj.seek(0)
+        return self.fileobj
+
+    def persist(self, path):
+        """Copy the bytes to path and return JSON-serialisable metadata"""
+        with open(path, 'wb') as out:
+            shutil.copyfileobj(self.open(), out, READ_CHUNK_SIZE)
+        return {'path': path, 'size': self.size, 'sha256': self.sha256}
+
+    def close(self):
+        self.fileobj.close()
+
+
+class ContentWriter:
+    """
+    Incrementally decode base64 text, in memory up to SPOOL_MAX_MEMORY bytes
+    and in a temporary file beyond that.
+    """
+
+    def __init__(self):
+        self.fileobj = io.BytesIO()
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.pending = ''
+
+    def write(self, text):
+        text = self.pending + ''.join(text.split())
+        usable = len(text) - len(text) % 4
+        self.pending = text[usable:]
+        if usable:
+            self._emit(base64.b64decode(text[:usable]))
+
+    def _emit(self, data):
+        if isinstance(self.fileobj, io.BytesIO) and self.size + len(data) > SPOOL_MAX_MEMORY:
+            spilled = tempfile.TemporaryFile()
+            spilled.write(self.fileobj.getvalue())
+            self.fileobj.close()
+            self.fileobj = spilled
+        self.fileobj.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+
+    def finish(self):
+        if self.pending:
+            # Tolerate senders that strip base64 padding
+            self._emit(base64.b64decode(self.pending + '=' * (-len(self.pending) % 4)))
+            self.pending = ''
+        return FileContent(self.fileobj, self.size, self.digest.hexdigest())
+
+
+class StreamingParser:
+    """
+    Minimal incremental JSON parser for archive request bodies.
+
+    Reads the body in fixed-size chunks. Every value is parsed normally except
+    files[*].content, which is base64-decoded chunk by chunk into a spooled
+    FileContent instead of being held as one big string.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            text = self.decoder.decode(b'', final=True)
+        else:
+            text = self.decoder.decode(chunk)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return bool(text) or not self.eof
+
+    def _peek(self):
+        while self.pos >= len(self.buffer):
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON body")
+        return self.buffer[self.pos]
+
+    def _next(self):
+        char = self._peek()
+        self.pos += 1
+        return char
+
+    def _skip_whitespace(self):
+        while self._peek() in WHITESPACE:
+            self.pos += 1
+
+    def _expect(self, char):
+        self._skip_whitespace()
+        found = self._next()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found}'")
+
+    def parse(self):
+        self._skip_whitespace()
+        if self._peek() != '{':
+            raise ValueError("Archive request body must be a JSON object")
+        result = self._parse_object(path=())
+        while self.pos < len(self.buffer) or self._fill():
+            if self.buffer[self.pos:].strip():
+                raise ValueError("Unexpected data after JSON body")
+            self.pos = len(self.buffer)
+        return result
+
+    def _parse_value(self, path):
+        self._skip_whitespace()
+        char = self._peek()
+        if char == '{':
+            return self._parse_object(path)
+        if char == '[':
+            return self._parse_array(path)
+        if char == '"':
+            self.pos += 1
+            if len(path) == 3 and path[0] == 'files' and path[2] == 'content':
+                writer = ContentWriter()
+                self._read_string(writer.write)
+                return writer.finish()
+            parts = []
+            self._read_string(parts.append)
+            return ''.join(parts)
+        return self._parse_literal()
+
+    def _parse_object(self, path):
+        self._expect('{')
+        result = {}
+        self._skip_whitespace()
+        if self._peek() == '}':
+            self.pos += 1
+            return result
+        while True:
+            self._expect('"')
+            parts = []
+            self._read_string(parts.append)
+            key = ''.join(parts)
+            self._expect(':')
+            result[key] = self._parse_value(path + (key,))
+            self._skip_whitespace()
+            char = self._next()
+            if char == '}':
+                return result
+            if char != ',':
+                raise ValueError(f"Expected ',' or '}}' but found '{char}'")
+            self._skip_whitespace()
+
+    def _parse_array(self, path):
+        self._expect('[')
+        result = []
+        self._skip_whitespace()
+        if self._peek() == ']':
+            self.pos += 1
+            return result
+        while True:
+            result.append(self._parse_value(path + (len(result),)))
+            self._skip_whitespace()
+            char = self._next()
+            if char == ']':
+                return result
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' but found '{char}'")
+
+    def _read_string(self, sink):
+        """Feed the string's characters to sink in slices until the closing quote"""
+        while True:
+            self._peek()
+            end = len(self.buffer)
+            quote = self.buffer.find('"', self.pos)
+            backslash = self.buffer.find('\\', self.pos)
+            stop = min(i for i in (quote, backslash, end) if i != -1)
+            if stop > self.pos:
+                sink(self.buffer[self.pos:stop])
+                self.pos = stop
+            if stop == end:
+                continue
+            self.pos += 1
+            if stop == quote:
+                return
+            sink(self._read_escape())
+
+    def _read_escape(self):
+        char = self._next()
+        if char in ESCAPES:
+            return ESCAPES[char]
+        if char != 'u':
+            raise ValueError(f"Invalid escape '\\{char}'")
+        code = int(''.join(self._next() for _ in range(4)), 16)
+        if 0xD800 <= code < 0xDC00 and self._peek() == '\\':
+            self.pos += 1
+            if self._next() == 'u':
+                low = int(''.join(self._next() for _ in range(4)), 16)
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00))
+        return chr(code)
+
+    def _parse_literal(self):
+        chars = []
+        while True:
+            if self.pos >= len(self.buffer) and not self._fill():
+                break
+            char = self.buffer[self.pos]
+            if char in ',]}' or char in WHITESPACE:
+                break
+            chars.append(char)
+            self.pos += 1
+        return json.loads(''.join(chars))
+
+
+def parse_archive_request(stream):
+    """Parse an archive request body from a binary stream"""
+    return StreamingParser(stream).parse()
+
+
+def describe_file(file):
+    """Log-safe summary of an archived file: metadata, size and hash, never bytes"""
+    content = file.get('content')
+    return {
+        'name': file.get('name'),
+        'path': file.get('path'),
+        'pathTemplateValues': file.get('pathTemplateValues'),
+        'contentType': file.get('contentType'),
+        'size': content.size if isinstance(content, FileContent) else None,
+        'sha256': content.sha256 if isinstance(content, FileContent) else None
+    }
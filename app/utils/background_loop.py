@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """
+    A long-lived asyncio loop on a daemon thread.
+
+    Flask runs each async view on its own short-lived loop, so anything that
+    must outlive a request (pooled async clients, pollers, jobs) runs here and
+    request handlers await it through run().
+    """
+
+    def __init__(self, name='background-loop'):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._owned = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the loop thread if it is not already running"""
+        with self._lock:
+            if self.loop is not None:
+                return self.loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+                loop.close()
+
+            self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            self.loop = loop
+            self._owned = True
+            return loop
+
+    def adopt(self, loop):
+        """
+        Use an existing loop, e.g. the ASGI server's, instead of starting a thread.
+
+        Returns False if a loop is already running; callers then keep
+        reaching it through run() as usual.
+        """
+        with self._lock:
+            if self.loop is not None:
+                return self.loop is loop
+            self.loop = loop
+            self._thread = threading.current_thread()
+            self._owned = False
+            return True
+
+    def submit(self, coro):
+        """Schedule coro on the loop from any thread, returning a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    async def run(self, coro):
+        """Await coro on the background loop from whatever loop the caller is on"""
+        loop = self.start()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def in_loop(self):
+        """True when called from the loop's own thread"""
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def stop(self, timeout=5):
+        """Stop the loop and wait for its thread to exit"""
+        with self._lock:
+            loop, thread, owned = self.loop, self._thread, self._owned
+            self.loop = self._thread = None
+        if loop is None or not owned:
+            # An adopted loop belongs to whoever is running it
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
+
+background_loop = BackgroundLoop()
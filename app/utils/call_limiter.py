@@ -0,0 +1,92 @@
+import asyncio
+import collections
+import threading
+
+
+class LimiterFull(Exception):
+    """Raised when no call slot frees up in time"""
+
+
+class CallLimiter:
+    """
+    Caps how many verification calls are in flight at once.
+
+    Callers beyond the limit wait in a bounded FIFO queue for up to timeout
+    seconds; once the queue is full they are rejected immediately. Waiters
+    may be on different event loops (each Flask async view has its own), so
+    slots are handed over with call_soon_threadsafe.
+    """
+
+    def __init__(self, max_concurrent=10, max_queued=20, timeout=30.0):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_flight < self.max_concurrent and not self._waiters:
+                self.in_flight += 1
+                return
+            if len(self._waiters) >= self.max_queued:
+                self.rejected += 1
+                raise LimiterFull("Too many verifications in progress")
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), timeout=self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                granted = waiter not in self._waiters
+                if not granted:
+                    self._waiters.remove(waiter)
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.timed_out += 1
+                        self.rejected += 1
+            if granted:
+                # The slot was handed over as we gave up; pass it on
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                raise LimiterFull("Timed out waiting for a free call slot")
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            # The slot moves straight to the next waiter; in_flight stays the same
+            loop, future = self._waiters.popleft()
+        try:
+            loop.call_soon_threadsafe(self._grant, future)
+        except RuntimeError:
+            # The waiter's loop already closed
+            self.release()
+
+    @staticmethod
+    def _grant(future):
+        if not future.done():
+            future.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'inFlight': self.in_flight,
+                'queued': len(self._waiters),
+                'rejected': self.rejected,
+                'timedOut': self.timed_out,
+                'maxConcurrent': self.max_concurrent,
+                'maxQueued': self.max_queued
+            }
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from .background_loop import background_loop
+from .call_registry import call_registry
+
+logger = logging.getLogger(__name__)
+
+
+class CallPoller:
+    """
+    One background task that polls every in-flight call and fans results out.
+
+    Each call is polled on its own adaptive schedule: every min_interval
+    while it is near its expected end, otherwise backing off exponentially
+    up to max_interval, always with jitter. When several calls are due at
+    once they are fetched together through the list endpoint. A call whose
+    fetch fails backs off on its own; the others keep their schedule.
+    """
+
+    def __init__(self, fetch_one, fetch_many, min_interval=2.0, max_interval=30.0,
+                 expected_duration=45.0, near_window=15.0):
+        self.fetch_one = fetch_one
+        self.fetch_many = fetch_many
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.expected_duration = expected_duration
+        self.near_window = near_window
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self._task = None
+        self.polls = 0
+        self.batch_polls = 0
+
+    def track(self, call_id, started_at=None):
+        """Start polling call_id; results are published to call_registry"""
+        now = time.time()
+        with self._lock:
+            self._calls[call_id] = {
+                'started_at': started_at or now,
+                'next_poll': now + self.min_interval,
+                'interval': self.min_interval
+            }
+            start = self._task is None
+            if start:
+                self._task = background_loop.submit(self._run())
+        if not start:
+            self._wake()
+
+    def untrack(self, call_id):
+        with self._lock:
+            self._calls.pop(call_id, None)
+
+    def _wake(self):
+        loop = background_loop.loop
+        if loop is not None and self._wakeup is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _schedule(self, state, now):
+        """Pick the next poll time for a call that has not ended yet"""
+        expected_end = state['started_at'] + self.expected_duration
+        if abs(expected_end - now) <= self.near_window:
+            interval = self.min_interval
+        else:
+            interval = min(self.max_interval, state['interval'] * 2)
+            if now < expected_end - self.near_window:
+                # Don't sleep through the window where the call is likely to end
+                interval = min(interval, max(self.min_interval, expected_end - self.near_window - now))
+        state['interval'] = interval
+        state['next_poll'] = now + interval * random.uniform(0.8, 1.2)
+
+    def _backoff(self, state, now):
+        """Push back a call whose status fetch failed"""
+        state['interval'] = min(self.max_interval, state['interval'] * 2)
+        state['next_poll'] = now + state['interval'] * random.uniform(0.8, 1.2)
+
+    async def _run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            with self._lock:
+                # Pull in calls that are almost due so they share one list request
+                due = [call_id for call_id, state in self._calls.items() if state['next_poll'] <= now]
+                if due:
+                    slack = now + self.min_interval / 2
+                    due = [call_id for call_id, state in self._calls.items() if state['next_poll'] <= slack]
+                upcoming = [state['next_poll'] for state in self._calls.values()]
+
+            if not due:
+                timeout = min(upcoming) - now if upcoming else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            results, failed = await self._fetch(due)
+
+            now = time.time()
+            for call_id in due:
+                call_data = results.get(call_id)
+                with self._lock:
+                    state = self._calls.get(call_id)
+                    if state is None:
+                        continue
+                    if call_id in failed:
+                        self._backoff(state, now)
+                    elif call_data and call_data.get('status') == 'ended':
+                        del self._calls[call_id]
+                    else:
+                        self._schedule(state, now)
+                if not call_data:
+                    continue
+                if call_data.get('status') == 'ended':
+                    call_registry.publish(call_id, {'type': 'ended', 'call': call_data})
+                else:
+                    call_registry.publish(call_id, {
+                        'type': 'status',
+                        'status': call_data.get('status'),
+                        'messages': call_data.get('messages', [])
+                    })
+
+    async def _fetch(self, call_ids):
+        """
+        Fetch due calls, in one list request when there are several.
+
+        Returns (results by call ID, IDs whose fetch failed). If the list
+        request fails, every call falls back to its own request, and one
+        failing call doesn't cost the others their result.
+        """
+        results = {}
+        failed = set()
+        if len(call_ids) > 1:
+            with self._lock:
+                since = min((self._calls[call_id]['started_at'] for call_id in call_ids if call_id in self._calls), default=time.time())
+            self.batch_polls += 1
+            try:
+                for call_data in await self.fetch_many(since, len(call_ids)):
+                    if call_data.get('id') in call_ids:
+                        results[call_data['id']] = call_data
+            except Exception as e:
+                logger.error(f"❌ Batch call status poll failed, polling calls one by one: {str(e)}")
+        for call_id in call_ids:
+            if call_id not in results:
+                self.polls += 1
+                try:
+                    results[call_id] = await self.fetch_one(call_id)
+                except Exception as e:
+                    logger.error(f"❌ Status poll for call {call_id} failed: {str(e)}")
+                    failed.add(call_id)
+        return results, failed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked': len(self._calls),
+                'polls': self.polls,
+                'batchPolls': self.batch_polls
+            }
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from .ttl_cache import TTLCache
+
+
+class CallWatcher:
+    """Event queue for one in-flight call, bound to the loop that awaits it"""
+
+    def __init__(self, call_id):
+        self.call_id = call_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, event):
+        # Safe from any thread or loop
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        except RuntimeError:
+            # The waiting loop already closed
+            pass
+
+    async def next_event(self):
+        return await self.queue.get()
+
+
+class CallRegistry:
+    """
+    In-process map of call ID -> watchers waiting on that call.
+
+    VAPI server messages and pollers publish events here from whatever
+    thread they run on; each waiting handler wakes up on its own loop.
+    Ended calls are remembered briefly so a report that beats register()
+    is not lost.
+    """
+
+    def __init__(self, ended_ttl=300):
+        self._watchers = {}
+        self._lock = threading.Lock()
+        self._ended = TTLCache(maxsize=1024, ttl=ended_ttl)
+
+    def register(self, call_id):
+        """Start watching call_id; must be called from the waiting coroutine"""
+        watcher = CallWatcher(call_id)
+        with self._lock:
+            self._watchers.setdefault(call_id, []).append(watcher)
+        ended = self._ended.get(call_id)
+        if ended is not None:
+            watcher.deliver({'type': 'ended', 'call': ended})
+        return watcher
+
+    def unregister(self, watcher):
+        with self._lock:
+            watchers = self._watchers.get(watcher.call_id, [])
+            if watcher in watchers:
+                watchers.remove(watcher)
+            if not watchers:
+                self._watchers.pop(watcher.call_id, None)
+
+    def publish(self, call_id, event):
+        """Deliver event to everyone watching call_id; returns how many were woken"""
+        if event.get('type') == 'ended':
+            self._ended.set(call_id, event['call'])
+        with self._lock:
+            watchers = list(self._watchers.get(call_id, []))
+        for watcher in watchers:
+            watcher.deliver(event)
+        return len(watchers)
+
+    def active_calls(self):
+        with self._lock:
+            return list(self._watchers)
+
+
+call_registry = CallRegistry()
@@ -0,0 +1,97 @@
+import re
+
+UNITS = {
+    'zero': '0', 'oh': '0', 'o': '0', 'one': '1', 'two': '2', 'three': '3',
+    'four': '4', 'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9'
+}
+TEENS = {
+    'ten': '10', 'eleven': '11', 'twelve': '12', 'thirteen': '13', 'fourteen': '14',
+    'fifteen': '15', 'sixteen': '16', 'seventeen': '17', 'eighteen': '18', 'nineteen': '19'
+}
+TENS = {
+    'twenty': '2', 'thirty': '3', 'forty': '4', 'fifty': '5',
+    'sixty': '6', 'seventy': '7', 'eighty': '8', 'ninety': '9'
+}
+REPEATS = {'double': 2, 'triple': 3}
+# Words people put between digits without meaning to end the number
+FILLERS = {'and', 'uh', 'um', 'er', 'ah', 'then', 'dash'}
+# Sentence punctuation is kept as a token so it ends the number being read out
+TOKEN_RE = re.compile(r"[a-z]+|\d|[.!?;]")
+
+
+def message_text(message):
+    """Text of a transcript message in either VAPI or OpenAI shape"""
+    text = message.get('message')
+    if text is None:
+        text = message.get('content')
+    return text if isinstance(text, str) else ''
+
+
+def digit_runs(text):
+    """
+    Spoken or written digit sequences in text, as strings of digits.
+
+    "four two one seven", "4-2-1-7", "forty two seventeen" and
+    "double four one seven" all come out as one run each. A run ends at
+    sentence punctuation, so "4217. 4217." is two runs.
+    """
+    runs = []
+    current = ''
+    repeat = 1
+    tokens = TOKEN_RE.findall(text.lower())
+    for i, token in enumerate(tokens):
+        if token.isdigit() or token in UNITS:
+            current += (token if token.isdigit() else UNITS[token]) * repeat
+            repeat = 1
+        elif token in TEENS:
+            current += TEENS[token]
+            repeat = 1
+        elif token in TENS:
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            # "forty two" is 42; a bare "forty" is 40
+            if not (following in UNITS and following not in ('zero', 'oh', 'o')):
+                current += TENS[token] + '0'
+            else:
+                current += TENS[token]
+                tokens[i + 1] = UNITS[following]
+            repeat = 1
+        elif token in REPEATS:
+            repeat = REPEATS[token]
+        elif token in FILLERS and current:
+            continue
+        else:
+            if current:
+                runs.append(current)
+            current = ''
+            repeat = 1
+    if current:
+        runs.append(current)
+    return runs
+
+
+def match_code(messages, code, max_attempts=2):
+    """
+    Decide a verification from the user's turns alone.
+
+    Returns (True, reason) once a user turn says exactly the code as one
+    digit run, (False, reason) once the user has given max_attempts wrong
+    codes, and (None, None) while it is still ambiguous so the caller can
+    wait for more turns or fall back to the LLM analysis. A run that
+    contains the code ("4217 4217", "one 4217") is neither a match nor a
+    wrong attempt, since it may be the code repeated or next to another
+    number.
+    """
+    wrong = 0
+    for message in messages:
+        if message.get('role') != 'user':
+            continue
+        runs = digit_runs(message_text(message))
+        if any(run == code for run in runs):
+            return True, "Code matched in transcript"
+        if any(code in run for run in runs):
+            continue
+        if any(len(run) >= len(code) for run in runs):
+            wrong += 1
+            if wrong >= max_attempts:
+                return False, f"Incorrect code given {wrong} times"
+    return None, None
@@ -0,0 +1,154 @@
+import heapq
+import sqlite3
+import threading
+import time
+
+
+class CooldownStore:
+    """
+    Per-key cooldowns: acquire() succeeds once per key until ttl passes or release().
+
+    Stores hold at most max_entries live cooldowns. A full store refuses new
+    keys rather than dropping a running cooldown, so a flood of numbers can't
+    be used to clear the cooldown of another.
+    """
+
+    def acquire(self, key, ttl):
+        """Start a cooldown for key; False if one is already running or the store is full"""
+        raise NotImplementedError
+
+    def release(self, key):
+        """End key's cooldown early"""
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class MemoryCooldownStore(CooldownStore):
+    """
+    Single-process store with heap-based expiry and a hard size cap.
+
+    Expired entries are popped off a min-heap of expiry times on every call,
+    so nothing outlives its ttl even if release() is never reached.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._expires = {}
+        self._heap = []
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _expire(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._heap)
+            # Skip stale heap entries for keys that were released or renewed
+            if self._expires.get(key) == expires_at:
+                del self._expires[key]
+
+    def acquire(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._expires:
+                return False
+            if len(self._expires) >= self.max_entries:
+                self.rejected += 1
+                return False
+            expires_at = now + ttl
+            self._expires[key] = expires_at
+            heapq.heappush(self._heap, (expires_at, key))
+            if len(self._heap) > 2 * self.max_entries:
+                # Too many stale entries from releases; rebuild
+                self._heap = [(expires_at, key) for key, expires_at in self._expires.items()]
+                heapq.heapify(self._heap)
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._expires.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                'backend': 'memory',
+                'active': len(self._expires),
+                'maxEntries': self.max_entries,
+                'rejected': self.rejected
+            }
+
+
+class SqliteCooldownStore(CooldownStore):
+    """
+    Cooldowns in a shared SQLite file so every worker process sees them.
+
+    acquire() runs in one write transaction, so two workers racing for the
+    same key cannot both win, and the size check can't be raced past either.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cooldowns (
+        key TEXT PRIMARY KEY,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS cooldowns_expires_at ON cooldowns (expires_at);
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(self.SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def acquire(self, key, ttl):
+        # Wall clock, since monotonic time isn't shared between processes
+        now = time.time()
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute("DELETE FROM cooldowns WHERE expires_at <= ?", (now,))
+            # Only live rows are left, so the count is the number of running cooldowns
+            full = db.execute("SELECT COUNT(*) FROM cooldowns").fetchone()[0] >= self.max_entries
+            acquired = not full and db.execute(
+                "INSERT INTO cooldowns (key, expires_at) VALUES (?, ?) "
+                "ON CONFLICT(key) DO NOTHING",
+                (key, now + ttl)
+            ).rowcount == 1
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return acquired
+
+    def release(self, key):
+        self._connect().execute("DELETE FROM cooldowns WHERE key = ?", (key,))
+
+    def stats(self):
+        active = self._connect().execute(
+            "SELECT COUNT(*) FROM cooldowns WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+        return {
+            'backend': 'sqlite',
+            'active': active,
+            'maxEntries': self.max_entries
+        }
+
+
+def create_cooldown_store(backend='memory', path='cooldowns.db', max_entries=10000):
+    """Build the configured cooldown backend"""
+    if backend == 'sqlite':
+        return SqliteCooldownStore(path, max_entries=max_entries)
+    if backend == 'memory':
+        return MemoryCooldownStore(max_entries=max_entries)
+    raise ValueError(f"Unknown cooldown backend: {backend}")
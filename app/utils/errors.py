@@ -26,6 +26,15 @@ class WebhookError(BaseError):
     """Raised when webhook processing fails"""
     pass
 
+class ArchiveError(BaseError):
+    """Raised when files cannot be archived to Notion"""
+    pass
+
+class NotionUnavailableError(ArchiveError):
+    """Raised when Notion answers with a retryable status, i.e. it is down or overloaded"""
+    def __init__(self, message):
+        super().__init__(message, status_code=503)
+
 class DataIOError(Exception):
     """Custom exception for Data IO errors"""
     def __init__(self, code, message, status_code=400):
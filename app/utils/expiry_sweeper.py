@@ -0,0 +1,78 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ExpirySweeper:
+    """
+    Periodically deletes expired rows in small batches.
+
+    Each task is a (name, delete_batch) pair where delete_batch(limit)
+    removes at most about limit rows and returns how many it removed. Tasks
+    are drained batch by batch with a pause in between, capped at
+    max_batches per pass, so a large backlog is cleared over several passes
+    instead of in one long-running delete.
+    """
+
+    def __init__(self, tasks, interval=3600.0, batch_size=500, batch_pause=1.0, max_batches=20):
+        self.tasks = tasks
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.max_batches = max_batches
+        self.passes = 0
+        self.last_pass = None
+        self.removed = {name: 0 for name, _ in tasks}
+
+    def sweep(self):
+        """Run one pass over every task; returns rows removed per task"""
+        removed = {}
+        for name, delete_batch in self.tasks:
+            removed[name] = 0
+            for _ in range(self.max_batches):
+                try:
+                    count = delete_batch(self.batch_size)
+                except Exception as e:
+                    logger.error(f"❌ Expiry sweep of {name} failed: {str(e)}")
+                    break
+                removed[name] += count
+                if count < self.batch_size:
+                    break
+                time.sleep(self.batch_pause)
+            self.removed[name] += removed[name]
+        self.passes += 1
+        self.last_pass = {'at': time.time(), 'removed': removed}
+        logger.info(f"🧹 Expiry sweep removed {removed}")
+        return removed
+
+    def start(self, wrap=None):
+        """
+        Sweep on a daemon thread every interval seconds.
+
+        wrap, if given, is a context manager factory each pass runs inside
+        (e.g. app.app_context).
+        """
+        def run():
+            while True:
+                try:
+                    if wrap is None:
+                        self.sweep()
+                    else:
+                        with wrap():
+                            self.sweep()
+                except Exception as e:
+                    logger.error(f"❌ Expiry sweep error: {str(e)}")
+                time.sleep(self.interval)
+
+        thread = threading.Thread(target=run, name='expiry-sweeper', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            'passes': self.passes,
+            'lastPass': self.last_pass,
+            'removed': dict(self.removed)
+        }
@@ -0,0 +1,121 @@
+import atexit
+import importlib.util
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from .background_loop import background_loop
+
+DEFAULTS = {
+    'HTTP_POOL_CONNECTIONS': 10,
+    'HTTP_POOL_MAXSIZE': 20,
+    'HTTP_KEEPALIVE_EXPIRY': 30.0,
+    'HTTP_TIMEOUT': 30.0
+}
+
+
+class HttpClients:
+    """
+    App-scoped outbound HTTP clients with one keep-alive pool per upstream.
+
+    - notion: requests.Session shared by every archive thread
+    - vapi: httpx.AsyncClient living on the background loop, HTTP/2 if h2 is installed
+
+    Supabase has its own holder in supabase_client.
+    """
+
+    def __init__(self, config=None):
+        config = {**DEFAULTS, **{k: v for k, v in (config or {}).items() if k in DEFAULTS and v is not None}}
+        self.pool_connections = int(config['HTTP_POOL_CONNECTIONS'])
+        self.pool_maxsize = int(config['HTTP_POOL_MAXSIZE'])
+        self.keepalive_expiry = float(config['HTTP_KEEPALIVE_EXPIRY'])
+        self.timeout = float(config['HTTP_TIMEOUT'])
+        self.http2 = importlib.util.find_spec('h2') is not None
+
+        self.notion = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        self.notion.mount('https://', adapter)
+        self.notion.mount('http://', adapter)
+
+        self._vapi = None
+
+    async def _vapi_client(self):
+        # Must be created on the loop it will be used from
+        if self._vapi is None:
+            self._vapi = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+        return self._vapi
+
+    async def vapi_request(self, method, url, **kwargs):
+        """Send a VAPI request through the shared async client"""
+        async def send():
+            client = await self._vapi_client()
+            return await client.request(method, url, **kwargs)
+        return await background_loop.run(send())
+
+    def close(self):
+        """Close every pool"""
+        self.notion.close()
+        if self._vapi is not None and background_loop.loop is not None:
+            closing = background_loop.submit(self._vapi.aclose())
+            # Blocking on the loop's own thread would deadlock it
+            if not background_loop.in_loop():
+                closing.result(timeout=5)
+        self._vapi = None
+
+    async def aclose(self):
+        """Close every pool from a coroutine, e.g. on ASGI shutdown"""
+        vapi, self._vapi = self._vapi, None
+        self.close()
+        if vapi is not None:
+            await background_loop.run(vapi.aclose())
+
+
+clients = None
+clients_lock = threading.Lock()
+
+
+def init_http_clients(app):
+    """Create the app's clients from config and close them on shutdown"""
+    global clients
+    with clients_lock:
+        if clients is not None:
+            clients.close()
+        clients = HttpClients(app.config)
+    app.extensions['http_clients'] = clients
+    return clients
+
+
+def get_http_clients():
+    """Return the shared clients, creating them from the environment if no app did"""
+    global clients
+    with clients_lock:
+        if clients is None:
+            clients = HttpClients({key: os.getenv(key) for key in DEFAULTS})
+        return clients
+
+
+@atexit.register
+def close_http_clients():
+    global clients
+    with clients_lock:
+        if clients is not None:
+            clients.close()
+            clients = None
+
+
+async def aclose_http_clients():
+    """Async counterpart of close_http_clients for use on the serving loop"""
+    global clients
+    with clients_lock:
+        closing, clients = clients, None
+    if closing is not None:
+        await closing.aclose()
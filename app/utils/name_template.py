@@ -0,0 +1,59 @@
+import re
+from functools import lru_cache
+
+PLACEHOLDER = re.compile(r'\{\{\s*(.*?)\s*\}\}')
+
+
+class CompiledTemplate:
+    """
+    A name/path pattern split once into literal and slot segments.
+
+    Slots are numbered by the order their placeholder names first appear,
+    which is how DocuSign's pathTemplateValues list lines up with them.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.literals = []
+        self.slots = []
+        self.placeholders = []
+        self.names = []
+        position = 0
+        for match in PLACEHOLDER.finditer(pattern):
+            name = match.group(1)
+            if name not in self.names:
+                self.names.append(name)
+            self.literals.append(pattern[position:match.start()])
+            self.slots.append(self.names.index(name))
+            self.placeholders.append(match.group(0))
+            position = match.end()
+        self.literals.append(pattern[position:])
+
+    def render(self, values):
+        """
+        Fill every slot in one pass.
+
+        values may be a list (positional by slot) or a dict (by placeholder
+        name). Placeholders without a value are left as written.
+        """
+        if not self.slots:
+            return self.pattern
+        if isinstance(values, dict):
+            values = [values.get(name) for name in self.names]
+        values = values or []
+        parts = [self.literals[0]]
+        for slot, placeholder, literal in zip(self.slots, self.placeholders, self.literals[1:]):
+            value = values[slot] if slot < len(values) else None
+            parts.append(placeholder if value is None else str(value))
+            parts.append(literal)
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=1024)
+def compile_template(pattern):
+    """Parse pattern once; repeated patterns in a batch reuse the cached result"""
+    return CompiledTemplate(pattern)
+
+
+def render_template(pattern, values):
+    return compile_template(pattern or '').render(values)
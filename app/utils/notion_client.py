@@ -0,0 +1,121 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import requests
+from .http_clients import get_http_clients
+from .ttl_cache import TTLCache
+
+NOTION_API_URL = os.getenv('NOTION_API_URL', 'https://api.notion.com/v1')
+NOTION_VERSION = '2022-06-28'
+
+# Notion allows roughly 3 requests/second per integration
+NOTION_RATE_LIMIT = float(os.getenv('NOTION_RATE_LIMIT', 3))
+NOTION_BURST = int(os.getenv('NOTION_BURST', 3))
+# Total time a single call may spend waiting and retrying
+NOTION_RETRY_DEADLINE = float(os.getenv('NOTION_RETRY_DEADLINE', 30))
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Blocking token bucket shared by every caller for one workspace"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Stop handing out tokens for seconds, e.g. after a 429"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self, deadline):
+        """Wait for a token, returning False if deadline would pass first"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+buckets = TTLCache(maxsize=4096, ttl=3600)
+
+
+def token_key(notion_token):
+    """Key for a Notion token that never keeps the raw token in memory"""
+    return hashlib.sha256(notion_token.encode('utf-8')).hexdigest()
+
+
+def get_bucket(notion_token):
+    return buckets.get_or_load(
+        token_key(notion_token),
+        lambda: TokenBucket(NOTION_RATE_LIMIT, NOTION_BURST)
+    )
+
+
+def retry_after(response, attempt):
+    """Seconds to wait before retrying, from Retry-After or jittered backoff"""
+    header = response.headers.get('Retry-After') if response is not None else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    # Full jitter exponential backoff, capped at 8 seconds
+    return random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+
+
+def notion_request(method, path, notion_token, deadline=None, **kwargs):
+    """
+    Send a request to the Notion API through the workspace's rate limiter.
+
+    429s honour Retry-After, transient 5xx and connection errors are retried
+    with jittered backoff, all within NOTION_RETRY_DEADLINE seconds. The last
+    response is returned once retries are exhausted so callers can report it.
+    """
+    deadline = deadline or time.monotonic() + NOTION_RETRY_DEADLINE
+    bucket = get_bucket(notion_token)
+    headers = {
+        'Authorization': f'Bearer {notion_token}',
+        'Notion-Version': NOTION_VERSION,
+        **kwargs.pop('headers', {})
+    }
+    session = get_http_clients().notion
+    kwargs.setdefault('timeout', get_http_clients().timeout)
+
+    attempt = 0
+    while True:
+        if not bucket.acquire(deadline):
+            raise TimeoutError(f"Notion rate limit wait exceeded deadline for {path}")
+
+        response = None
+        try:
+            response = session.request(method, f"{NOTION_API_URL}{path}", headers=headers, **kwargs)
+            if response.status_code not in RETRYABLE_STATUSES:
+                return response
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        wait = retry_after(response, attempt)
+        if response is not None and response.status_code == 429:
+            bucket.pause(wait)
+        attempt += 1
+        if time.monotonic() + wait >= deadline:
+            if response is None:
+                raise error
+            return response
+        print(f"🔄 Notion {method} {path} returned {response.status_code if response is not None else 'connection error'}, retrying in {wait:.1f}s")
+        time.sleep(wait)
@@ -0,0 +1,132 @@
+import io
+import math
+import mimetypes
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from .errors import ArchiveError, NotionUnavailableError
+from .notion_client import notion_request, RETRYABLE_STATUSES
+
+# Notion accepts single-part uploads up to 20 MB; larger files go multi-part
+NOTION_SINGLE_PART_LIMIT = int(os.getenv('NOTION_SINGLE_PART_LIMIT', 20 * 1024 * 1024))
+# Multi-part parts must be 5-20 MB (except the last one)
+NOTION_UPLOAD_PART_SIZE = int(os.getenv('NOTION_UPLOAD_PART_SIZE', 10 * 1024 * 1024))
+NOTION_UPLOAD_CONCURRENCY = int(os.getenv('NOTION_UPLOAD_CONCURRENCY', 3))
+
+DEFAULT_CONTENT_TYPE = 'application/pdf'
+
+
+@contextmanager
+def content_view(content):
+    """
+    Yield a read-only memoryview over a FileContent's bytes without copying.
+
+    Content held in memory exposes its BytesIO buffer directly; content on
+    disk (including reopened queue blobs) is memory-mapped.
+    """
+    fileobj = content.open()
+    if content.size == 0:
+        yield memoryview(b'')
+    elif isinstance(fileobj, io.BytesIO):
+        view = fileobj.getbuffer()
+        try:
+            yield view
+        finally:
+            view.release()
+    else:
+        mapped = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            mapped.close()
+
+
+def upload_name(filename):
+    """Return (filename, content type), adding a .pdf extension if none is present"""
+    content_type, _ = mimetypes.guess_type(filename)
+    if content_type:
+        return filename, content_type
+    return f"{filename}.pdf", DEFAULT_CONTENT_TYPE
+
+
+def check(response, action):
+    if response.status_code in RETRYABLE_STATUSES:
+        raise NotionUnavailableError(f"Notion {action} failed: {response.text}")
+    if response.status_code != 200:
+        raise ArchiveError(f"Notion {action} failed: {response.text}", status_code=502)
+    return response.json()
+
+
+def send_part(notion_token, upload_id, filename, content_type, chunk, part_number=None):
+    """Send one part (or the whole file) of an upload"""
+    data = {'part_number': str(part_number)} if part_number else None
+    response = notion_request(
+        'POST',
+        f'/file_uploads/{upload_id}/send',
+        notion_token,
+        files={'file': (filename, chunk, content_type)},
+        data=data
+    )
+    return check(response, f"upload of part {part_number or 1}")
+
+
+def upload_file(notion_token, content, filename):
+    """
+    Upload a FileContent to Notion and return the file upload ID.
+
+    Files up to NOTION_SINGLE_PART_LIMIT go in one request. Larger files are
+    split into NOTION_UPLOAD_PART_SIZE slices of one memoryview, sent
+    concurrently, then completed.
+    """
+    filename, content_type = upload_name(filename)
+    parts = math.ceil(content.size / NOTION_UPLOAD_PART_SIZE) if content.size > NOTION_SINGLE_PART_LIMIT else 1
+
+    if parts == 1:
+        upload = check(notion_request('POST', '/file_uploads', notion_token, json={
+            "mode": "single_part",
+            "filename": filename,
+            "content_type": content_type
+        }), "file upload create")
+        with content_view(content) as view:
+            send_part(notion_token, upload['id'], filename, content_type, view)
+        print(f"✅ Uploaded {filename} ({content.size} bytes)")
+        return upload['id']
+
+    upload = check(notion_request('POST', '/file_uploads', notion_token, json={
+        "mode": "multi_part",
+        "number_of_parts": parts,
+        "filename": filename,
+        "content_type": content_type
+    }), "file upload create")
+
+    with content_view(content) as view:
+        def send(part_number):
+            start = (part_number - 1) * NOTION_UPLOAD_PART_SIZE
+            chunk = view[start:start + NOTION_UPLOAD_PART_SIZE]
+            try:
+                return send_part(notion_token, upload['id'], filename, content_type, chunk, part_number)
+            finally:
+                chunk.release()
+
+        with ThreadPoolExecutor(max_workers=min(NOTION_UPLOAD_CONCURRENCY, parts)) as executor:
+            list(executor.map(send, range(1, parts + 1)))
+
+    check(notion_request('POST', f"/file_uploads/{upload['id']}/complete", notion_token), "file upload complete")
+    print(f"✅ Uploaded {filename} ({content.size} bytes in {parts} parts)")
+    return upload['id']
+
+
+def file_block(upload_id, filename):
+    """Page block that attaches an uploaded file"""
+    return {
+        "object": "block",
+        "type": "file",
+        "file": {
+            "type": "file_upload",
+            "file_upload": {"id": upload_id},
+            "name": filename
+        }
+    }
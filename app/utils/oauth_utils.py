@@ -3,6 +3,11 @@ import uuid
 from datetime import datetime, timedelta
 from flask import current_app
 from .errors import AuthError
+from .token_service import get_token_service
+
+def token_service():
+    """The TokenService for the configured JWT_SECRET_KEY"""
+    return get_token_service(current_app.config['JWT_SECRET_KEY'])
 
 def generate_verification_code():
     """Generate a 6-digit verification code"""
@@ -15,7 +20,7 @@ def generate_access_token(user_id):
         'sub': str(user_id),
         'exp': datetime.utcnow() + timedelta(hours=1)
     }
-    return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+    return token_service().issue(payload)
 
 def generate_refresh_token(user_id):
     """Generate JWT refresh token"""
@@ -25,16 +30,12 @@ def generate_refresh_token(user_id):
         'exp': datetime.utcnow() + timedelta(days=30),
         'jti': str(uuid.uuid4())
     }
-    return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+    return token_service().issue(payload)
 
 def verify_token(token):
     """Verify a JWT token"""
     try:
-        return jwt.decode(
-            token,
-            current_app.config['JWT_SECRET_KEY'],
-            algorithms=['HS256']
-        )
+        return token_service().verify(token)
     except jwt.InvalidTokenError:
         raise AuthError("Invalid token")
 
@@ -0,0 +1,349 @@
+import json
+import sqlite3
+import threading
+import uuid
+
+OAUTH_TOKEN_COLUMNS = ('state', 'notion_token', 'workspace_id', 'workspace_name', 'redirect_uri', 'created_at', 'last_used')
+DOCUSIGN_STATE_COLUMNS = ('state', 'params', 'created_at', 'expires_at')
+
+
+class Storage:
+    """
+    Persistence behind app.supabase_db.
+
+    Timestamps are naive-UTC ISO-8601 strings, as the rest of the app writes
+    them. Rows come back as plain dicts.
+    """
+
+    def insert_oauth_row(self, row):
+        """Insert an oauth_tokens row; returns it"""
+        raise NotImplementedError
+
+    def get_oauth_row(self, state):
+        """First oauth_tokens row for state, or None"""
+        raise NotImplementedError
+
+    def update_last_used(self, state, at):
+        raise NotImplementedError
+
+    def insert_docusign_state(self, row):
+        raise NotImplementedError
+
+    def get_docusign_state(self, state):
+        raise NotImplementedError
+
+    def delete_expired_docusign_states(self, now, limit):
+        """Delete up to limit rows with expires_at before now; returns how many"""
+        raise NotImplementedError
+
+    def delete_abandoned_oauth_states(self, cutoff, limit):
+        """Delete up to limit token-less oauth_tokens rows created before cutoff; returns (count, states)"""
+        raise NotImplementedError
+
+    def store_verification_code(self, phone, code, expires_at):
+        raise NotImplementedError
+
+    def verify_code(self, phone, code, now):
+        """Mark a matching unexpired, unused code verified; True if there was one"""
+        raise NotImplementedError
+
+    def create_or_get_user(self, phone, now):
+        """Return the user ID for phone, creating the user if needed"""
+        raise NotImplementedError
+
+    def store_user_session(self, user_id, refresh_token, expires_at):
+        raise NotImplementedError
+
+
+class SupabaseStorage(Storage):
+    """Storage in Supabase tables through PostgREST"""
+
+    def __init__(self, get_client):
+        self.get_client = get_client
+
+    def table(self, name):
+        return self.get_client().table(name)
+
+    def insert_oauth_row(self, row):
+        result = self.table('oauth_tokens').insert(row).execute()
+        return result.data[0] if result.data else row
+
+    def get_oauth_row(self, state):
+        response = self.table('oauth_tokens')\
+            .select(', '.join(OAUTH_TOKEN_COLUMNS))\
+            .eq('state', state)\
+            .limit(1)\
+            .execute()
+        return response.data[0] if response.data else None
+
+    def update_last_used(self, state, at):
+        self.table('oauth_tokens')\
+            .update({'last_used': at})\
+            .eq('state', state)\
+            .execute()
+
+    def insert_docusign_state(self, row):
+        result = self.table('docusign_states').insert(row).execute()
+        return result.data[0] if result.data else row
+
+    def get_docusign_state(self, state):
+        response = self.table('docusign_states')\
+            .select(', '.join(DOCUSIGN_STATE_COLUMNS))\
+            .eq('state', state)\
+            .limit(1)\
+            .execute()
+        return response.data[0] if response.data else None
+
+    def delete_expired_docusign_states(self, now, limit):
+        expired = self.table('docusign_states')\
+            .select('state')\
+            .lt('expires_at', now)\
+            .limit(limit)\
+            .execute()
+        states = [row['state'] for row in expired.data]
+        if not states:
+            return 0
+        deleted = self.table('docusign_states')\
+            .delete()\
+            .in_('state', states)\
+            .lt('expires_at', now)\
+            .execute()
+        return len(deleted.data)
+
+    def delete_abandoned_oauth_states(self, cutoff, limit):
+        abandoned = self.table('oauth_tokens')\
+            .select('state')\
+            .is_('notion_token', 'null')\
+            .lt('created_at', cutoff)\
+            .limit(limit)\
+            .execute()
+        states = [row['state'] for row in abandoned.data]
+        if not states:
+            return 0, []
+        deleted = self.table('oauth_tokens')\
+            .delete()\
+            .in_('state', states)\
+            .is_('notion_token', 'null')\
+            .lt('created_at', cutoff)\
+            .execute()
+        return len(deleted.data), states
+
+    def store_verification_code(self, phone, code, expires_at):
+        self.table('verification_codes').insert({
+            'phone': phone,
+            'code': code,
+            'expires_at': expires_at
+        }).execute()
+
+    def verify_code(self, phone, code, now):
+        found = self.table('verification_codes')\
+            .select('id')\
+            .eq('phone', phone)\
+            .eq('code', code)\
+            .gt('expires_at', now)\
+            .eq('verified', False)\
+            .limit(1)\
+            .execute()
+        if not found.data:
+            return False
+        # Conditional on verified = false so a code can't be used twice
+        marked = self.table('verification_codes')\
+            .update({'verified': True})\
+            .eq('id', found.data[0]['id'])\
+            .eq('verified', False)\
+            .execute()
+        return bool(marked.data)
+
+    def create_or_get_user(self, phone, now):
+        # No id in the payload, so an existing user keeps theirs
+        result = self.table('users')\
+            .upsert({'phone': phone, 'last_login': now}, on_conflict='phone')\
+            .execute()
+        return result.data[0]['id']
+
+    def store_user_session(self, user_id, refresh_token, expires_at):
+        self.table('user_sessions').insert({
+            'user_id': user_id,
+            'refresh_token': refresh_token,
+            'expires_at': expires_at
+        }).execute()
+
+
+class SqliteStorage(Storage):
+    """
+    Embedded storage for single-node deployments and tests.
+
+    One connection per thread in WAL mode, so readers never block the
+    writer. Every query is a fixed parameterised statement, which sqlite3
+    compiles once per connection and reuses from its statement cache.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS oauth_tokens (
+        id INTEGER PRIMARY KEY,
+        state TEXT NOT NULL,
+        notion_token TEXT,
+        workspace_id TEXT,
+        workspace_name TEXT,
+        redirect_uri TEXT,
+        created_at TEXT NOT NULL,
+        last_used TEXT
+    );
+    CREATE INDEX IF NOT EXISTS oauth_tokens_state ON oauth_tokens (state);
+    CREATE INDEX IF NOT EXISTS oauth_tokens_abandoned ON oauth_tokens (created_at) WHERE notion_token IS NULL;
+
+    CREATE TABLE IF NOT EXISTS docusign_states (
+        id INTEGER PRIMARY KEY,
+        state TEXT NOT NULL,
+        params TEXT,
+        created_at TEXT NOT NULL,
+        expires_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS docusign_states_state ON docusign_states (state);
+    CREATE INDEX IF NOT EXISTS docusign_states_expires_at ON docusign_states (expires_at);
+
+    CREATE TABLE IF NOT EXISTS verification_codes (
+        id INTEGER PRIMARY KEY,
+        phone TEXT NOT NULL,
+        code TEXT NOT NULL,
+        expires_at TEXT NOT NULL,
+        verified INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS verification_codes_lookup ON verification_codes (phone, code, verified);
+
+    CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY,
+        phone TEXT NOT NULL UNIQUE,
+        last_login TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        id INTEGER PRIMARY KEY,
+        user_id TEXT NOT NULL REFERENCES users (id),
+        refresh_token TEXT NOT NULL,
+        expires_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS user_sessions_user_id ON user_sessions (user_id);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None, cached_statements=256)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('PRAGMA foreign_keys=ON')
+            self._local.db = db
+        return db
+
+    def insert_oauth_row(self, row):
+        row = {column: row.get(column) for column in OAUTH_TOKEN_COLUMNS}
+        self._connect().execute(
+            "INSERT INTO oauth_tokens (state, notion_token, workspace_id, workspace_name, redirect_uri, created_at, last_used) "
+            "VALUES (:state, :notion_token, :workspace_id, :workspace_name, :redirect_uri, :created_at, :last_used)",
+            row
+        )
+        return row
+
+    def get_oauth_row(self, state):
+        row = self._connect().execute(
+            "SELECT state, notion_token, workspace_id, workspace_name, redirect_uri, created_at, last_used "
+            "FROM oauth_tokens WHERE state = ? ORDER BY id LIMIT 1",
+            (state,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def update_last_used(self, state, at):
+        self._connect().execute("UPDATE oauth_tokens SET last_used = ? WHERE state = ?", (at, state))
+
+    def insert_docusign_state(self, row):
+        self._connect().execute(
+            "INSERT INTO docusign_states (state, params, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (row['state'], json.dumps(row.get('params')), row['created_at'], row['expires_at'])
+        )
+        return row
+
+    def get_docusign_state(self, state):
+        row = self._connect().execute(
+            "SELECT state, params, created_at, expires_at FROM docusign_states WHERE state = ? ORDER BY id LIMIT 1",
+            (state,)
+        ).fetchone()
+        if not row:
+            return None
+        row = dict(row)
+        row['params'] = json.loads(row['params']) if row['params'] else None
+        return row
+
+    def delete_expired_docusign_states(self, now, limit):
+        return self._connect().execute(
+            "DELETE FROM docusign_states WHERE id IN ("
+            "SELECT id FROM docusign_states WHERE expires_at < ? LIMIT ?)",
+            (now, limit)
+        ).rowcount
+
+    def delete_abandoned_oauth_states(self, cutoff, limit):
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            rows = db.execute(
+                "SELECT id, state FROM oauth_tokens WHERE notion_token IS NULL AND created_at < ? LIMIT ?",
+                (cutoff, limit)
+            ).fetchall()
+            db.executemany("DELETE FROM oauth_tokens WHERE id = ?", [(row['id'],) for row in rows])
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return len(rows), [row['state'] for row in rows]
+
+    def store_verification_code(self, phone, code, expires_at):
+        self._connect().execute(
+            "INSERT INTO verification_codes (phone, code, expires_at) VALUES (?, ?, ?)",
+            (phone, code, expires_at)
+        )
+
+    def verify_code(self, phone, code, now):
+        # One statement, so two requests can't both use the same code
+        return self._connect().execute(
+            "UPDATE verification_codes SET verified = 1 WHERE id = ("
+            "SELECT id FROM verification_codes "
+            "WHERE phone = ? AND code = ? AND verified = 0 AND expires_at > ? LIMIT 1)",
+            (phone, code, now)
+        ).rowcount == 1
+
+    def create_or_get_user(self, phone, now):
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                "INSERT INTO users (id, phone, last_login) VALUES (?, ?, ?) "
+                "ON CONFLICT (phone) DO UPDATE SET last_login = excluded.last_login",
+                (str(uuid.uuid4()), phone, now)
+            )
+            user_id = db.execute("SELECT id FROM users WHERE phone = ?", (phone,)).fetchone()['id']
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return user_id
+
+    def store_user_session(self, user_id, refresh_token, expires_at):
+        self._connect().execute(
+            "INSERT INTO user_sessions (user_id, refresh_token, expires_at) VALUES (?, ?, ?)",
+            (user_id, refresh_token, expires_at)
+        )
+
+
+def create_storage(backend='supabase', path='docuvoice.db', get_client=None):
+    """Build the configured storage backend"""
+    if backend == 'sqlite':
+        return SqliteStorage(path)
+    if backend == 'supabase':
+        return SupabaseStorage(get_client)
+    raise ValueError(f"Unknown storage backend: {backend}")
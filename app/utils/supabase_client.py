@@ -0,0 +1,83 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from supabase import create_client, ClientOptions
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', os.getenv('HTTP_TIMEOUT', 30)))
+
+
+class SupabaseClientHolder:
+    """
+    One Supabase client per process, shared by every thread.
+
+    The client is built on first use and reused after that, so its PostgREST
+    session keeps its keep-alive connections between OAuth steps. It is
+    rebuilt only if the URL, key or timeout changes.
+    """
+
+    def __init__(self, timeout=SUPABASE_TIMEOUT):
+        self.timeout = timeout
+        # (config, client), swapped as one so readers never see a mismatched pair
+        self._current = (None, None)
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.reuses = 0
+
+    def get(self, url, key):
+        config = (url, key, self.timeout)
+        current_config, client = self._current
+        if client is not None and current_config == config:
+            self.reuses += 1
+            return client
+        with self._lock:
+            current_config, client = self._current
+            if client is not None and current_config == config:
+                self.reuses += 1
+                return client
+            if client is not None:
+                logger.info("Supabase config changed, rebuilding client")
+                self._close(client)
+            started = time.perf_counter()
+            client = create_client(
+                url,
+                key,
+                options=ClientOptions(postgrest_client_timeout=self.timeout)
+            )
+            self._current = (config, client)
+            self.builds += 1
+            logger.info(f"Supabase client created in {(time.perf_counter() - started) * 1000:.1f}ms")
+            return client
+
+    @staticmethod
+    def _close(client):
+        """Close the client's PostgREST HTTP session through the public attributes"""
+        try:
+            postgrest = getattr(client, 'postgrest', None)
+            session = getattr(postgrest, 'session', None)
+            close = getattr(session, 'close', None)
+            if callable(close):
+                close()
+        except Exception as e:
+            logger.error(f"❌ Error closing Supabase client: {str(e)}")
+
+    def close(self):
+        with self._lock:
+            client = self._current[1]
+            self._current = (None, None)
+        if client is not None:
+            self._close(client)
+
+    def stats(self):
+        return {
+            'builds': self.builds,
+            'reuses': self.reuses,
+            'connected': self._current[1] is not None
+        }
+
+
+supabase_clients = SupabaseClientHolder()
+atexit.register(supabase_clients.close)
@@ -0,0 +1,140 @@
+import base64
+import calendar
+import functools
+import hashlib
+import heapq
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import jwt
+
+# Same header bytes PyJWT writes for HS256, so tokens are interchangeable
+HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b'=')
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+class TokenService:
+    """
+    HS256 JWT issue/verify with the key prepared once.
+
+    Tokens are checked by jwt.decode (signature, exp, nbf, iat, with
+    leeway), and only its result is cached: verified tokens are remembered
+    in an LRU keyed by the token's digest until their exp (or cache_ttl for
+    tokens without one), so re-presenting a token skips the decode. Tokens
+    passed to revoke() are held in memory, in this process only, until they
+    would have expired anyway, and are checked on every verify, cached or
+    not.
+    """
+
+    def __init__(self, secret, cache_size=4096, cache_ttl=300, leeway=0):
+        self.secret = secret
+        self.key = secret.encode('utf-8') if isinstance(secret, str) else secret
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.leeway = leeway
+        self._verified = OrderedDict()
+        self._revoked = {}
+        # (expires_at, digest) for _revoked, soonest first
+        self._revoked_expiry = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _sign(self, signing_input):
+        return b64encode(hmac.new(self.key, signing_input, hashlib.sha256).digest())
+
+    def issue(self, claims):
+        """Encode claims as a JWT; datetime values become unix timestamps like PyJWT"""
+        claims = {
+            k: calendar.timegm(v.utctimetuple()) if isinstance(v, datetime) else v
+            for k, v in claims.items()
+        }
+        signing_input = HEADER + b'.' + b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        return (signing_input + b'.' + self._sign(signing_input)).decode('ascii')
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8') if isinstance(token, str) else token).digest()
+
+    def verify(self, token):
+        """Return the token's claims; raises jwt.InvalidTokenError subclasses like jwt.decode"""
+        if not isinstance(token, str) or not token:
+            raise jwt.DecodeError("Invalid token")
+        digest = self.digest(token)
+        now = time.time()
+        with self._lock:
+            if digest in self._revoked:
+                raise jwt.InvalidTokenError("Token has been revoked")
+            entry = self._verified.get(digest)
+            if entry is not None:
+                claims, expires_at = entry
+                if expires_at > now:
+                    self._verified.move_to_end(digest)
+                    self.hits += 1
+                    return dict(claims)
+                del self._verified[digest]
+            self.misses += 1
+
+        claims = self._decode(token)
+        exp = claims.get('exp')
+        expires_at = min(exp + self.leeway, now + self.cache_ttl) if exp is not None else now + self.cache_ttl
+        with self._lock:
+            self._verified[digest] = (claims, expires_at)
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return dict(claims)
+
+    def _decode(self, token, verify_exp=True):
+        return jwt.decode(
+            token,
+            self.key,
+            algorithms=['HS256'],
+            leeway=self.leeway,
+            options={'verify_exp': verify_exp}
+        )
+
+    def revoke(self, token, expires_at=None):
+        """Reject token from now on, until expires_at (its exp, if it can be read)"""
+        if expires_at is None:
+            try:
+                expires_at = self._decode(token, verify_exp=False).get('exp')
+            except jwt.InvalidTokenError:
+                expires_at = None
+        digest = self.digest(token)
+        with self._lock:
+            self._verified.pop(digest, None)
+            self._prune_revoked(time.time())
+            # Tokens without exp are never valid-by-expiry, so keep them revoked
+            if expires_at is None:
+                self._revoked[digest] = float('inf')
+            else:
+                self._revoked[digest] = expires_at
+                heapq.heappush(self._revoked_expiry, (expires_at, digest))
+
+    def _prune_revoked(self, now):
+        while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+            expires_at, digest = heapq.heappop(self._revoked_expiry)
+            # Skip entries superseded by a later revoke of the same token
+            if self._revoked.get(digest) == expires_at:
+                del self._revoked[digest]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'cached': len(self._verified),
+                'revoked': len(self._revoked)
+            }
+
+
+@functools.lru_cache(maxsize=4)
+def get_token_service(secret):
+    """One TokenService per signing secret, so the key is prepared once"""
+    return TokenService(secret)
@@ -0,0 +1,85 @@
+import base64
+import hashlib
+import hmac
+import sqlite3
+import threading
+import time
+from cryptography.fernet import Fernet, InvalidToken
+from .notion_client import token_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workspace_tokens (
+    workspace TEXT PRIMARY KEY,
+    token BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS workspace_tokens_updated_at ON workspace_tokens (updated_at);
+"""
+
+
+class TokenVault:
+    """
+    Notion tokens by workspace reference, encrypted at rest.
+
+    Queued jobs and spooled page creates store the reference (token_key of
+    the token) and resolve it here when they run, so the token itself is
+    only ever on disk encrypted with a key derived from secret. Entries not
+    refreshed for ttl seconds are dropped.
+    """
+
+    def __init__(self, path, secret, ttl=30 * 24 * 3600, prune_every=100):
+        if not secret:
+            raise ValueError("JWT_SECRET_KEY is required to store Notion tokens for later")
+        self.path = path
+        self.ttl = ttl
+        self.prune_every = prune_every
+        key = hmac.new(secret.encode('utf-8'), b'workspace-tokens', hashlib.sha256).digest()
+        self._fernet = Fernet(base64.urlsafe_b64encode(key))
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def put(self, notion_token):
+        """Store notion_token and return the workspace reference to keep instead"""
+        workspace = token_key(notion_token)
+        self._connect().execute(
+            "INSERT OR REPLACE INTO workspace_tokens (workspace, token, updated_at) VALUES (?, ?, ?)",
+            (workspace, self._fernet.encrypt(notion_token.encode('utf-8')), time.time())
+        )
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self.prune()
+        return workspace
+
+    def get(self, workspace):
+        """Return the token for a workspace reference, or None if it is unknown or expired"""
+        row = self._connect().execute(
+            "SELECT token FROM workspace_tokens WHERE workspace = ? AND updated_at > ?",
+            (workspace, time.time() - self.ttl)
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            return self._fernet.decrypt(row[0]).decode('utf-8')
+        except InvalidToken:
+            # Written under a different secret
+            return None
+
+    def prune(self):
+        """Drop entries not refreshed within ttl"""
+        return self._connect().execute(
+            "DELETE FROM workspace_tokens WHERE updated_at <= ?",
+            (time.time() - self.ttl,)
+        ).rowcount
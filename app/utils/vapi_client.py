@@ -1,7 +1,12 @@
 import os
-import httpx
 import logging
 import asyncio
+import time
+from datetime import datetime, timezone
+from .http_clients import get_http_clients
+from .call_registry import call_registry
+from .call_poller import CallPoller
+from .background_loop import background_loop
 
 logger = logging.getLogger(__name__)
 
@@ -21,122 +26,330 @@ if not api_key:
 
 VAPI_BASE_URL = "https://api.vapi.ai"
 
-async def create_verification_assistant(verification_code, formatted_phone):
-    """Create a verification assistant and initiate call using direct API calls"""
-    async with httpx.AsyncClient() as client:
-        # Create assistant first
-        assistant_response = await client.post(
-            f"{VAPI_BASE_URL}/assistant",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "name": f"Phone Verification {verification_code}",
-                "model": {
-                    "provider": "openai",
-                    "model": "gpt-4",
-                    "temperature": 0.7,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": f"""You are a phone verification assistant. Your only job is to verify the code {verification_code}.
-
-                            Follow these exact steps:
-                            1. Listen for the user to say numbers
-                            2. Compare their numbers to {verification_code}
-                            3. If they say exactly {verification_code}:
-                               - Say "This call is verified. Thank you and have a great day."
-                               - Set result: VERIFIED
-                               - End call
-                            4. If they say different numbers:
-                               - Say "Incorrect code. Let me repeat it: {verification_code}"
-                               - Give one more try
-                               - If second attempt wrong:
-                                 - Say "This call is not verified. Thank you and have a great day."
-                                 - Set result: NOT_VERIFIED
-                                 - End call
-                            5. If no clear numbers heard:
-                               - Say "I need you to say the numbers {verification_code}"
-                               - If still no numbers:
-                                 - Say "This call is not verified. Thank you and have a great day."
-                                 - Set result: NOT_VERIFIED
-                                 - End call
-
-                            Always end your response with either:
-                            RESULT: VERIFIED
-                            or
-                            RESULT: NOT_VERIFIED"""
-                        }
-                    ]
-                },
-                "firstMessage": f"Hi, this is Jennifer from DocuVoice. I'm calling to verify your phone number for a DocuSign contract. Your verification code is: {verification_code}. Please repeat this code back to me.",
-                "firstMessageMode": "assistant-speaks-first",
-                "silenceTimeoutSeconds": 30,
-                "maxDurationSeconds": 300,
-                "endCallPhrases": [
-                    "This call is verified. Thank you and have a great day.",
-                    "This call is not verified. Thank you and have a great day."
-                ],
-                "analysisPlan": {
-                    "summaryPlan": {
-                        "enabled": True,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": f"""Analyze if the verification code {verification_code} was correctly provided.
-                                Return a JSON object with:
-                                - verified: boolean
-                                - reason: string explaining the verification result
-                                """
-                            }
-                        ]
-                    }
+# Public URL of /api/vapi/webhook; when set, VAPI pushes call status to us.
+# The webhook is only enabled together with VAPI_SERVER_SECRET, which VAPI
+# sends back in X-Vapi-Secret so forged messages can be rejected.
+VAPI_SERVER_URL = os.getenv('VAPI_SERVER_URL')
+VAPI_SERVER_SECRET = os.getenv('VAPI_SERVER_SECRET')
+VAPI_WEBHOOK_ENABLED = bool(VAPI_SERVER_URL and VAPI_SERVER_SECRET)
+if VAPI_SERVER_URL and not VAPI_SERVER_SECRET:
+    logger.error("❌ VAPI_SERVER_URL is set without VAPI_SERVER_SECRET; the webhook stays off and calls are polled")
+# Status polling: fast when there is no webhook, a slow backstop when there is.
+# Intervals back off exponentially except near the expected end of a call.
+VAPI_POLL_INTERVAL = float(os.getenv('VAPI_POLL_INTERVAL', 2))
+VAPI_FALLBACK_POLL_INTERVAL = float(os.getenv('VAPI_FALLBACK_POLL_INTERVAL', 15))
+VAPI_FALLBACK_POLL_MAX = float(os.getenv('VAPI_FALLBACK_POLL_MAX', 60))
+# Typical call length; polling speeds up around this point
+VAPI_EXPECTED_CALL_SECONDS = float(os.getenv('VAPI_EXPECTED_CALL_SECONDS', 45))
+
+# Longest a verification call may run; VAPI hangs up after this
+MAX_CALL_SECONDS = 300
+# Extra time before we give up on a call that never reports ending
+CALL_DEADLINE_GRACE = float(os.getenv('VAPI_CALL_DEADLINE_GRACE', 60))
+
+# Bump when the assistant prompt changes so a fresh assistant is created
+VERIFICATION_ASSISTANT_VERSION = 4
+VERIFICATION_ASSISTANT_NAME = f"DocuVoice Phone Verification v{VERIFICATION_ASSISTANT_VERSION}"
+# Pin an assistant from the VAPI dashboard instead of looking one up
+PINNED_ASSISTANT_ID = os.getenv('VAPI_VERIFICATION_ASSISTANT_ID')
+# Look up (or create) the assistant at startup instead of on the first call
+VAPI_WARM_ASSISTANT = os.getenv('VAPI_WARM_ASSISTANT', 'false').lower() == 'true'
+assistant_id = PINNED_ASSISTANT_ID
+assistant_lock = None
+
+
+class CallDeadlineExceeded(Exception):
+    """Raised when a call has not ended by its deadline"""
+
+def server_config():
+    """
+    Per-call overrides that route status-update/end-of-call-report messages to our webhook.
+
+    Passed with each call rather than stored on the shared assistant, so the
+    URL and secret always come from this deployment's config.
+    """
+    if not VAPI_WEBHOOK_ENABLED:
+        return {}
+    return {
+        "server": {"url": VAPI_SERVER_URL, "secret": VAPI_SERVER_SECRET},
+        "serverMessages": ["status-update", "conversation-update", "end-of-call-report"]
+    }
+
+def assistant_config():
+    """
+    The shared verification assistant.
+
+    Neither the code nor our webhook is baked in: {{code}} is filled per
+    call from assistantOverrides.variableValues, and server/serverMessages
+    are set there too, so one assistant serves every call and deployment.
+    """
+    return {
+        "name": VERIFICATION_ASSISTANT_NAME,
+        "model": {
+            "provider": "openai",
+            "model": "gpt-4",
+            "temperature": 0.7,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": """You are a phone verification assistant. Your only job is to verify the code {{code}}.
+
+                    Follow these exact steps:
+                    1. Listen for the user to say numbers
+                    2. Compare their numbers to {{code}}
+                    3. If they say exactly {{code}}:
+                       - Say "This call is verified. Thank you and have a great day."
+                       - Set result: VERIFIED
+                       - End call
+                    4. If they say different numbers:
+                       - Say "Incorrect code. Let me repeat it: {{code}}"
+                       - Give one more try
+                       - If second attempt wrong:
+                         - Say "This call is not verified. Thank you and have a great day."
+                         - Set result: NOT_VERIFIED
+                         - End call
+                    5. If no clear numbers heard:
+                       - Say "I need you to say the numbers {{code}}"
+                       - If still no numbers:
+                         - Say "This call is not verified. Thank you and have a great day."
+                         - Set result: NOT_VERIFIED
+                         - End call
+
+                    Always end your response with either:
+                    RESULT: VERIFIED
+                    or
+                    RESULT: NOT_VERIFIED"""
                 }
-            }
-        )
-        assistant_response.raise_for_status()
-        assistant = assistant_response.json()
-
-        # Create call using the assistant ID
-        call_response = await client.post(
-            f"{VAPI_BASE_URL}/call",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "name": f"DocuSign Verification {verification_code}",
-                "assistantId": assistant.get('id'),
-                "phoneNumberId": os.getenv('VAPI_PHONE_NUMBER_ID'),
-                "customer": {
-                    "number": formatted_phone,
-                    "numberE164CheckEnabled": True
+            ]
+        },
+        "firstMessage": "Hi, this is Jennifer from DocuVoice. I'm calling to verify your phone number for a DocuSign contract. Your verification code is: {{code}}. Please repeat this code back to me.",
+        "firstMessageMode": "assistant-speaks-first",
+        "silenceTimeoutSeconds": 30,
+        "maxDurationSeconds": MAX_CALL_SECONDS,
+        # Gives each call a monitor.controlUrl so we can hang it up
+        "monitorPlan": {"controlEnabled": True},
+        "endCallPhrases": [
+            "This call is verified. Thank you and have a great day.",
+            "This call is not verified. Thank you and have a great day."
+        ]
+    }
+
+def analysis_plan(verification_code):
+    """Per-call summary prompt that asks the LLM to judge this call's code"""
+    return {
+        "summaryPlan": {
+            "enabled": True,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": f"""Analyze if the verification code {verification_code} was correctly provided.
+                    Return a JSON object with:
+                    - verified: boolean
+                    - reason: string explaining the verification result
+                    """
                 }
-            }
-        )
-        call_response.raise_for_status()
-        return call_response.json()
+            ]
+        }
+    }
 
-async def wait_for_call_completion(call_id):
-    """Poll call status until completion"""
-    async with httpx.AsyncClient() as client:
-        while True:
-            response = await client.get(
-                f"{VAPI_BASE_URL}/call/{call_id}",
-                headers={"Authorization": f"Bearer {api_key}"}
+async def find_assistant():
+    """Return the ID of an existing assistant with our versioned name, if any"""
+    response = await get_http_clients().vapi_request(
+        'GET',
+        f"{VAPI_BASE_URL}/assistant",
+        headers={"Authorization": f"Bearer {api_key}"},
+        params={"limit": 1000}
+    )
+    response.raise_for_status()
+    for assistant in response.json():
+        if assistant.get('name') == VERIFICATION_ASSISTANT_NAME:
+            return assistant['id']
+    return None
+
+async def ensure_verification_assistant():
+    """Look up or create the shared verification assistant, caching its ID"""
+    global assistant_id, assistant_lock
+    if assistant_id:
+        return assistant_id
+    if assistant_lock is None:
+        assistant_lock = asyncio.Lock()
+    async with assistant_lock:
+        if assistant_id:
+            return assistant_id
+        found = await find_assistant()
+        if not found:
+            response = await get_http_clients().vapi_request(
+                'POST',
+                f"{VAPI_BASE_URL}/assistant",
+                headers={
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                },
+                json=assistant_config()
             )
             response.raise_for_status()
-            call_data = response.json()
-            
-            # Log status and messages for debugging
-            logger.info(f"Call status: {call_data.get('status')}")
-            if 'messages' in call_data:
-                logger.info("Current messages:")
-                for msg in call_data.get('messages', []):
-                    logger.info(f"{msg.get('role')}: {msg.get('content')}")
-            
-            if call_data.get('status') == 'ended':
-                return call_data
-                
-            await asyncio.sleep(2)  # Poll every 2 seconds 
\ No newline at end of file
+            found = response.json()['id']
+            logger.info(f"✅ Created verification assistant {VERIFICATION_ASSISTANT_NAME}: {found}")
+        else:
+            logger.info(f"✅ Using verification assistant {VERIFICATION_ASSISTANT_NAME}: {found}")
+        assistant_id = found
+        return assistant_id
+
+async def get_verification_assistant_id():
+    """Cached assistant ID; the first lookup runs once on the background loop"""
+    if assistant_id:
+        return assistant_id
+    return await background_loop.run(ensure_verification_assistant())
+
+def warm_verification_assistant():
+    """Resolve the assistant at startup so the first call doesn't pay for it"""
+    def report(future):
+        if future.exception():
+            logger.error(f"❌ Could not prepare verification assistant: {future.exception()}")
+    background_loop.submit(ensure_verification_assistant()).add_done_callback(report)
+
+async def create_verification_assistant(verification_code, formatted_phone):
+    """Start a verification call with the shared assistant, passing the code as a variable"""
+    global assistant_id
+    call_response = await get_http_clients().vapi_request(
+        'POST',
+        f"{VAPI_BASE_URL}/call",
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "name": f"DocuSign Verification {verification_code}",
+            "assistantId": await get_verification_assistant_id(),
+            "assistantOverrides": {
+                "variableValues": {"code": verification_code},
+                "analysisPlan": analysis_plan(verification_code),
+                **server_config()
+            },
+            "phoneNumberId": os.getenv('VAPI_PHONE_NUMBER_ID'),
+            "customer": {
+                "number": formatted_phone,
+                "numberE164CheckEnabled": True
+            }
+        }
+    )
+    if call_response.status_code in (400, 404) and 'assistant' in call_response.text.lower() and not PINNED_ASSISTANT_ID:
+        # Assistant was deleted in the dashboard; look it up again next time
+        assistant_id = None
+    call_response.raise_for_status()
+    return call_response.json()
+
+async def get_call(call_id):
+    """Fetch the current state of a call"""
+    response = await get_http_clients().vapi_request(
+        'GET',
+        f"{VAPI_BASE_URL}/call/{call_id}",
+        headers={"Authorization": f"Bearer {api_key}"}
+    )
+    response.raise_for_status()
+    return response.json()
+
+async def list_calls(since, count):
+    """Fetch calls on our number created since a unix timestamp, newest first"""
+    params = {
+        "createdAtGe": datetime.fromtimestamp(since - 1, tz=timezone.utc).isoformat(),
+        "limit": max(count, 100)
+    }
+    if os.getenv('VAPI_PHONE_NUMBER_ID'):
+        params["phoneNumberId"] = os.getenv('VAPI_PHONE_NUMBER_ID')
+    response = await get_http_clients().vapi_request(
+        'GET',
+        f"{VAPI_BASE_URL}/call",
+        headers={"Authorization": f"Bearer {api_key}"},
+        params=params
+    )
+    response.raise_for_status()
+    return response.json()
+
+# One poller for every in-flight call in this process
+call_poller = CallPoller(
+    get_call,
+    list_calls,
+    min_interval=VAPI_FALLBACK_POLL_INTERVAL if VAPI_WEBHOOK_ENABLED else VAPI_POLL_INTERVAL,
+    max_interval=VAPI_FALLBACK_POLL_MAX,
+    expected_duration=VAPI_EXPECTED_CALL_SECONDS
+)
+
+def parse_timestamp(value):
+    """Unix time from a VAPI ISO-8601 timestamp, or None"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+async def wait_for_call_completion(call_id, created_at=None, on_event=None, deadline=None):
+    """
+    Wait for a call to end.
+
+    Wakes as soon as the webhook delivers the end-of-call report. The shared
+    call_poller is the backstop (the webhook may be unset or land on another
+    worker), so concurrent verifications don't each run a poll loop.
+    on_event(event) is called with every status/transcript update on the way.
+    Raises CallDeadlineExceeded if the call is still going at deadline (unix time).
+    """
+    watcher = call_registry.register(call_id)
+    call_poller.track(call_id, parse_timestamp(created_at))
+    try:
+        while True:
+            timeout = deadline - time.time() if deadline else None
+            try:
+                event = await asyncio.wait_for(watcher.next_event(), timeout)
+            except asyncio.TimeoutError:
+                raise CallDeadlineExceeded(f"Call {call_id} did not end by its deadline")
+            logger.info(f"Call {call_id} event: {event.get('type')} {event.get('status', '')}")
+            if on_event:
+                on_event(event)
+            if event['type'] == 'ended':
+                return event['call']
+    finally:
+        call_poller.untrack(call_id)
+        call_registry.unregister(watcher)
+
+def call_deadline(call):
+    """When to give up on a call: its maximum duration plus a grace period"""
+    started_at = parse_timestamp(call.get('createdAt')) or time.time()
+    return started_at + MAX_CALL_SECONDS + CALL_DEADLINE_GRACE
+
+async def end_call(call):
+    """Hang up a live call through its monitor control URL"""
+    control_url = (call.get('monitor') or {}).get('controlUrl')
+    if not control_url:
+        raise ValueError(f"Call {call.get('id')} has no control URL")
+    response = await get_http_clients().vapi_request(
+        'POST',
+        control_url,
+        headers={"Content-Type": "application/json"},
+        json={"type": "end-call"}
+    )
+    response.raise_for_status()
+
+def call_from_report(message):
+    """Build the same shape GET /call returns from an end-of-call-report message"""
+    call = dict(message.get('call') or {})
+    artifact = message.get('artifact') or {}
+    call.update({
+        'status': 'ended',
+        'endedReason': message.get('endedReason', call.get('endedReason')),
+        'messages': artifact.get('messages', call.get('messages', [])),
+        'transcript': artifact.get('transcript', call.get('transcript')),
+        'analysis': message.get('analysis', call.get('analysis', {}))
+    })
+    return call
+
+def handle_server_message(message):
+    """Route a VAPI server message to whoever is waiting on that call"""
+    call_id = (message.get('call') or {}).get('id')
+    if not call_id:
+        return 0
+    if message.get('type') == 'end-of-call-report':
+        return call_registry.publish(call_id, {'type': 'ended', 'call': call_from_report(message)})
+    if message.get('type') == 'status-update':
+        return call_registry.publish(call_id, {'type': 'status', 'status': message.get('status')})
+    if message.get('type') == 'conversation-update':
+        return call_registry.publish(call_id, {'type': 'status', 'messages': message.get('messages', [])})
+    return 0
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+import uuid
+from .ttl_cache import TTLCache
+
+
+class VerificationJob:
+    """
+    State and event log of one asynchronous verification.
+
+    Events are numbered so SSE clients can resume with Last-Event-ID, and
+    readers block on a condition instead of polling. Coroutines wait with
+    wait_async()/wait_done_async() instead, and are woken on their own loop
+    so they hold no thread while they wait.
+    """
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.status = 'pending'
+        self.result = None
+        self.events = []
+        self.created_at = time.time()
+        self._cond = threading.Condition()
+        self._wakers = []
+        self._seen_messages = 0
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    def _notify(self):
+        # Caller holds _cond
+        self._cond.notify_all()
+        for wake in self._wakers:
+            wake()
+
+    def add_event(self, event_type, data):
+        with self._cond:
+            self.events.append({'id': len(self.events) + 1, 'type': event_type, 'data': data})
+            self._notify()
+
+    def set_status(self, status):
+        if status and status != self.status:
+            self.status = status
+            self.add_event('status', {'status': status})
+
+    def add_messages(self, messages):
+        """Emit transcript messages not sent yet"""
+        with self._cond:
+            new = messages[self._seen_messages:]
+            self._seen_messages = max(self._seen_messages, len(messages))
+        for message in new:
+            self.add_event('transcript', message)
+
+    def finish(self, result):
+        with self._cond:
+            self.status = 'completed'
+            self.result = result
+            self.events.append({'id': len(self.events) + 1, 'type': 'result', 'data': result})
+            self._notify()
+
+    def wait(self, after=0, timeout=None):
+        """Block until there are events past after, the job is done, or timeout"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.done or len(self.events) > after, timeout=timeout)
+            return self.events[after:]
+
+    def wait_done(self, timeout):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.done, timeout=timeout)
+
+    async def _wait_async(self, predicate, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        woken = asyncio.Event()
+
+        def wake():
+            # Called from whichever thread added the event
+            try:
+                loop.call_soon_threadsafe(woken.set)
+            except RuntimeError:
+                # The waiting loop already closed
+                pass
+
+        with self._cond:
+            self._wakers.append(wake)
+        try:
+            while True:
+                with self._cond:
+                    woken.clear()
+                    if predicate():
+                        return True
+                remaining = deadline - loop.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(woken.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._cond:
+                self._wakers.remove(wake)
+
+    async def wait_async(self, after=0, timeout=None):
+        """wait() for coroutines"""
+        await self._wait_async(lambda: self.done or len(self.events) > after, timeout)
+        with self._cond:
+            return self.events[after:]
+
+    async def wait_done_async(self, timeout):
+        """wait_done() for coroutines"""
+        return await self._wait_async(lambda: self.done, timeout)
+
+    def snapshot(self):
+        return {
+            'verificationId': self.id,
+            'status': self.status,
+            'result': self.result,
+            'createdAt': self.created_at
+        }
+
+
+class VerificationJobStore:
+    """Recent jobs, kept for ttl seconds after creation and capped at maxsize"""
+
+    def __init__(self, maxsize=1000, ttl=900):
+        self._jobs = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def create(self):
+        job = VerificationJob()
+        self._jobs.set(job.id, job)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark for JWT issue/verify.
+
+    python benchmarks/bench_token.py [iterations]
+
+Compares plain PyJWT with TokenService (cold and cached verify), then
+times POST /oauth/token through the Flask test client if the app can be
+created with the current environment.
+"""
+import base64
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+import jwt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.utils.token_service import TokenService
+
+SECRET = os.getenv('JWT_SECRET_KEY') or 'bench-secret'
+
+
+def claims():
+    return {
+        'type': 'access_token',
+        'sub': str(uuid.uuid4()),
+        'email': f"{uuid.uuid4()}@test.com",
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }
+
+
+def bench(name, fn, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<32} {iterations / elapsed:>12,.0f} ops/s  {elapsed / iterations * 1e6:>8.2f} µs/op")
+
+
+def bench_functions(iterations):
+    service = TokenService(SECRET, cache_size=iterations)
+    payloads = [claims() for _ in range(iterations)]
+    tokens = [jwt.encode(payload, SECRET) for payload in payloads]
+
+    bench("pyjwt encode", lambda i: jwt.encode(payloads[i], SECRET), iterations)
+    bench("TokenService.issue", lambda i: service.issue(payloads[i]), iterations)
+    bench("pyjwt decode", lambda i: jwt.decode(tokens[i], SECRET, algorithms=['HS256']), iterations)
+    bench("TokenService.verify (cold)", lambda i: service.verify(tokens[i]), iterations)
+    bench("TokenService.verify (cached)", lambda i: service.verify(tokens[i]), iterations)
+
+
+def bench_route(iterations):
+    try:
+        from app import create_app
+        app = create_app()
+    except Exception as e:
+        print(f"/oauth/token skipped: could not create app ({e})")
+        return
+    client = app.test_client()
+    code = app.config.get('AUTHORIZATION_CODE') or ''
+    credentials = f"{app.config.get('OAUTH_CLIENT_ID')}:{app.config.get('OAUTH_CLIENT_SECRET')}"
+    headers = {'Authorization': 'Basic ' + base64.b64encode(credentials.encode()).decode()}
+
+    issued = client.post('/oauth/token', data={'grant_type': 'authorization_code', 'code': code}, headers=headers)
+    if issued.status_code != 200:
+        print(f"/oauth/token skipped: authorization_code grant returned {issued.status_code}")
+        return
+    refresh_token = issued.get_json()['refresh_token']
+
+    bench("POST /oauth/token (code)", lambda i: client.post(
+        '/oauth/token', data={'grant_type': 'authorization_code', 'code': code}, headers=headers
+    ), iterations)
+    bench("POST /oauth/token (refresh)", lambda i: client.post(
+        '/oauth/token', data={'grant_type': 'refresh_token', 'refresh_token': refresh_token}, headers=headers
+    ), iterations)
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    bench_functions(iterations)
+    bench_route(max(iterations // 10, 1))
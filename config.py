@@ -30,6 +30,23 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
+    # Outbound HTTP connection pools (per upstream)
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 30))
+    HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 30))
+
+    # Local state files; relative paths resolve against DATA_DIR, so every
+    # worker process uses the same files whatever directory it started in
+    DATA_DIR = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+    COOLDOWN_DB_PATH = os.getenv('COOLDOWN_DB_PATH', 'cooldowns.db')
+    STORAGE_SQLITE_PATH = os.getenv('STORAGE_SQLITE_PATH', 'docuvoice.db')
+    ARCHIVE_QUEUE_PATH = os.getenv('ARCHIVE_QUEUE_PATH', 'archive_queue.db')
+    ARCHIVE_BLOB_DIR = os.getenv('ARCHIVE_BLOB_DIR', 'archive_queue.db.blobs')
+    ARCHIVE_VAULT_PATH = os.getenv('ARCHIVE_VAULT_PATH', 'archive_vault.db')
+    ARCHIVE_INDEX_PATH = os.getenv('ARCHIVE_INDEX_PATH', 'archive_index.db')
+    ARCHIVE_SPOOL_DIR = os.getenv('ARCHIVE_SPOOL_DIR', 'archive_spool')
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
@@ -1,4 +1,4 @@
-from app import create_app
+from app.asgi import application
 import asyncio
 from hypercorn.config import Config
 from hypercorn.asyncio import serve
@@ -8,7 +8,8 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = create_app()
+# Native ASGI app; Flask routes are bridged in, async routes share the server loop
+app = application
 
 if __name__ == '__main__':
     config = Config()
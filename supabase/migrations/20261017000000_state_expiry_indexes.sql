@@ -0,0 +1,33 @@
+-- OAuth / DocuSign state tables and the indexes the lookups and the expiry
+-- sweeper rely on. Safe to run against an existing database.
+
+create table if not exists docusign_states (
+    id bigint generated by default as identity primary key,
+    state text not null,
+    params jsonb,
+    created_at timestamptz not null default now(),
+    expires_at timestamptz not null
+);
+
+create table if not exists oauth_tokens (
+    id bigint generated by default as identity primary key,
+    state text not null,
+    notion_token text,
+    workspace_id text,
+    workspace_name text,
+    redirect_uri text,
+    created_at timestamptz not null default now(),
+    last_used timestamptz
+);
+
+-- get_docusign_state: .eq('state', ...)
+create index if not exists docusign_states_state_idx on docusign_states (state);
+-- Sweeper: expires_at < now()
+create index if not exists docusign_states_expires_at_idx on docusign_states (expires_at);
+
+-- get_oauth_state / get_oauth_token: .eq('state', ...)
+create index if not exists oauth_tokens_state_idx on oauth_tokens (state);
+-- Sweeper: consent attempts that never got a token, oldest first
+create index if not exists oauth_tokens_abandoned_created_at_idx
+    on oauth_tokens (created_at)
+    where notion_token is null;
@@ -0,0 +1,27 @@
+-- Tables behind store_verification_code / verify_code / create_or_get_user /
+-- store_user_session when STORAGE_BACKEND=supabase.
+
+create table if not exists verification_codes (
+    id bigint generated by default as identity primary key,
+    phone text not null,
+    code text not null,
+    expires_at timestamptz not null,
+    verified boolean not null default false
+);
+create index if not exists verification_codes_lookup_idx
+    on verification_codes (phone, code)
+    where verified = false;
+
+create table if not exists users (
+    id uuid primary key default gen_random_uuid(),
+    phone text not null unique,
+    last_login timestamptz
+);
+
+create table if not exists user_sessions (
+    id bigint generated by default as identity primary key,
+    user_id uuid not null references users (id),
+    refresh_token text not null,
+    expires_at timestamptz not null
+);
+create index if not exists user_sessions_user_id_idx on user_sessions (user_id);
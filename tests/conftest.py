@@ -0,0 +1,9 @@
+import os
+import sys
+
+# app/__init__ imports every blueprint, and the VAPI client refuses to load
+# without a key, so give the suite harmless defaults before anything imports app.
+os.environ.setdefault('VAPI_API_KEY', 'test-key')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-' + 'x' * 32)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
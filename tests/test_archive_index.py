@@ -0,0 +1,81 @@
+import threading
+import pytest
+from app.api import archive
+from app.utils.archive_index import ArchiveIndex
+from app.utils.archive_stream import FileContent
+
+KEY = ('workspace', 'Deals/Agreement', 'abc')
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = ArchiveIndex(str(tmp_path / 'index.db'))
+    monkeypatch.setattr(archive, 'archive_index', index)
+    return index
+
+
+def test_claim_lifecycle(index):
+    assert index.claim(*KEY) == (True, None)
+    assert index.claim(*KEY) == (False, None)
+    assert index.lookup(*KEY) is None
+    index.record(*KEY, 'page-1')
+    index.release(*KEY)
+    assert index.claim(*KEY) == (False, 'page-1')
+
+
+def test_released_or_stale_claims_can_be_taken(index):
+    assert index.claim(*KEY) == (True, None)
+    index.release(*KEY)
+    assert index.claim(*KEY) == (True, None)
+    assert index.claim(*KEY, claim_ttl=0) == (True, None)
+
+
+class FakeResponse:
+    status_code = 200
+    text = ''
+
+    def json(self):
+        return {'id': 'page-1'}
+
+
+def test_redelivery_during_create_waits_for_the_first_page(index, monkeypatch):
+    creating = threading.Event()
+    finish = threading.Event()
+    posts = []
+
+    def notion_request(method, path, notion_token, json=None):
+        posts.append(json)
+        creating.set()
+        assert finish.wait(5)
+        return FakeResponse()
+
+    monkeypatch.setattr(archive, 'notion_request', notion_request)
+    monkeypatch.setattr(archive, 'ARCHIVE_UPLOAD_FILES', False)
+
+    def make_file():
+        return {'name': 'Agreement', 'path': 'Deals/', 'content': FileContent.from_base64('SSBhZ3JlZSE=')}
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(archive.create_page('token', 'db-1', make_file())))
+    first.start()
+    assert creating.wait(5)
+    second = threading.Thread(target=lambda: results.append(archive.create_page('token', 'db-1', make_file())))
+    second.start()
+    finish.set()
+    first.join(5)
+    second.join(5)
+
+    assert results == [('Agreement', True), ('Agreement', True)]
+    assert len(posts) == 1
+
+
+def test_failed_create_releases_its_claim(index, monkeypatch):
+    class Failed(FakeResponse):
+        status_code = 400
+
+    monkeypatch.setattr(archive, 'notion_request', lambda *args, **kwargs: Failed())
+    monkeypatch.setattr(archive, 'ARCHIVE_UPLOAD_FILES', False)
+    file = {'name': 'Agreement', 'path': 'Deals/', 'content': FileContent.from_base64('SSBhZ3JlZSE=')}
+    assert archive.create_page('token', 'db-1', file) == ('Agreement', False)
+    key = (archive.token_key('token'), 'Deals//Agreement', file['content'].sha256)
+    assert index.claim(*key) == (True, None)
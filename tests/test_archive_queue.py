@@ -0,0 +1,42 @@
+import sqlite3
+from app.utils.archive_queue import ArchiveQueue, SUCCEEDED
+from app.utils.token_vault import TokenVault
+
+
+def test_jobs_store_a_workspace_reference_not_the_token(tmp_path):
+    vault = TokenVault(str(tmp_path / 'vault.db'), 'secret')
+    queue = ArchiveQueue(str(tmp_path / 'queue.db'))
+    job_id = queue.enqueue(vault.put('secret_notion_token'), {"files": [], "processed": []})
+
+    job = queue.claim()
+    assert job['id'] == job_id
+    assert vault.get(job['workspace']) == 'secret_notion_token'
+    queue.finish(job_id, SUCCEEDED, {"message": "done"})
+
+    for path in ('queue.db', 'vault.db'):
+        with open(tmp_path / path, 'rb') as f:
+            assert b'secret_notion_token' not in f.read()
+    db = sqlite3.connect(str(tmp_path / 'queue.db'))
+    assert db.execute("SELECT payload FROM archive_jobs").fetchone()[0] == '{}'
+
+
+def test_vault_rejects_tokens_written_under_another_secret(tmp_path):
+    workspace = TokenVault(str(tmp_path / 'vault.db'), 'old-secret').put('secret_notion_token')
+    assert TokenVault(str(tmp_path / 'vault.db'), 'new-secret').get(workspace) is None
+
+
+def test_legacy_queue_drops_plaintext_tokens(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    db = sqlite3.connect(path)
+    db.executescript("""
+    CREATE TABLE archive_jobs (
+        id TEXT PRIMARY KEY, status TEXT NOT NULL, notion_token TEXT NOT NULL, payload TEXT NOT NULL,
+        result TEXT, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL,
+        created_at REAL NOT NULL, updated_at REAL NOT NULL
+    );
+    INSERT INTO archive_jobs VALUES ('job-1', 'queued', 'secret_notion_token', '{}', NULL, 0, 0, 0, 0);
+    """)
+    db.close()
+
+    job = ArchiveQueue(path).claim()
+    assert job['workspace'] == ''
@@ -0,0 +1,69 @@
+import json
+import os
+import time
+from app.utils.archive_spool import DEAD_LETTER_FILE, ArchiveSpool, start_replayer
+
+
+def dead_letters(spool):
+    path = os.path.join(spool.directory, DEAD_LETTER_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_append_after_a_partial_line_starts_a_new_line(tmp_path):
+    spool = ArchiveSpool(str(tmp_path))
+    spool.append({'n': 1})
+    # A writer that died halfway through a record
+    with open(os.path.join(str(tmp_path), spool.segments()[-1]), 'ab') as f:
+        f.write(b'{"n": 2, "pa')
+    spool.append({'n': 3})
+    spool.seal()
+    records = [record['n'] for segment in spool.sealed_segments() for _, record in spool.pending(segment)]
+    assert records == [1, 3]
+
+
+def test_failing_records_are_dead_lettered_without_blocking_the_rest(tmp_path):
+    spool = ArchiveSpool(str(tmp_path))
+    spool.append({'n': 1, 'upload': 'missing-blob'})
+    with open(os.path.join(str(tmp_path), spool.segments()[-1]), 'ab') as f:
+        f.write(b'not json\n')
+    spool.append({'n': 2})
+    attempts = []
+    replayed = []
+
+    def replay(record):
+        attempts.append(record['n'])
+        if 'upload' in record:
+            raise FileNotFoundError(record['upload'])
+        replayed.append(record['n'])
+        return True
+
+    start_replayer(spool, replay, lambda record: True, rate=1000, idle_interval=0.01, max_backoff=0.01, max_attempts=3)
+    wait_for(lambda: replayed == [2])
+
+    assert attempts.count(1) == 3
+    dead = dead_letters(spool)
+    assert [entry.get('n') for entry in dead] == [1, None]
+    assert dead[0]['reason'] == "Failed 3 times: missing-blob"
+    assert json.loads(dead[0]['raw'])['upload'] == 'missing-blob'
+    assert dead[1]['raw'] == 'not json'
+
+
+def test_read_only_stats_create_nothing(tmp_path):
+    directory = str(tmp_path / 'spool')
+    assert ArchiveSpool(directory, read_only=True).stats()['depth'] == 0
+    assert not os.path.exists(directory)
+
+    ArchiveSpool(directory).append({'n': 1})
+    before = sorted(os.listdir(directory))
+    assert ArchiveSpool(directory, read_only=True).stats()['depth'] == 1
+    assert sorted(os.listdir(directory)) == before
@@ -0,0 +1,144 @@
+import os
+import pytest
+import requests
+from app.api import archive
+from app.utils.archive_index import ArchiveIndex
+from app.utils.archive_spool import ArchiveSpool
+from app.utils.archive_stream import FileContent
+from app.utils.errors import NotionUnavailableError
+from app.utils.token_vault import TokenVault
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    spool = ArchiveSpool(str(tmp_path / 'spool'))
+    monkeypatch.setattr(archive, 'archive_spool', spool)
+    monkeypatch.setattr(archive, 'archive_index', ArchiveIndex(str(tmp_path / 'index.db')))
+    monkeypatch.setattr(archive, 'token_vault', TokenVault(str(tmp_path / 'vault.db'), 'secret'))
+    monkeypatch.setattr(archive, 'ARCHIVE_SPOOL_ENABLED', True)
+    monkeypatch.setattr(archive, 'ARCHIVE_UPLOAD_FILES', True)
+    return spool
+
+
+def spooled_records(spool):
+    spool.seal()
+    return [record for segment in spool.sealed_segments() for _, record in spool.pending(segment)]
+
+
+def make_file():
+    return {'name': 'Agreement', 'path': 'Deals/', 'content': FileContent.from_base64('SSBhZ3JlZSE=')}
+
+
+@pytest.mark.parametrize('outage', [
+    requests.ConnectionError("connection refused"),
+    requests.Timeout("read timed out"),
+    NotionUnavailableError("Notion file upload create failed: 503")
+])
+def test_upload_outage_spools_page_with_content(spool, monkeypatch, outage):
+    def upload_file(notion_token, content, filename):
+        raise outage
+
+    def notion_request(*args, **kwargs):
+        raise AssertionError("page create must wait for the upload")
+
+    monkeypatch.setattr(archive, 'upload_file', upload_file)
+    monkeypatch.setattr(archive, 'notion_request', notion_request)
+
+    assert archive.create_page('secret_token', 'db-1', make_file()) == ('Agreement', True)
+
+    records = spooled_records(spool)
+    assert len(records) == 1
+    assert 'notion_token' not in records[0]
+    assert archive.spooled_token(records[0]) == 'secret_token'
+    assert 'children' not in records[0]['page']
+    with open(records[0]['upload']['path'], 'rb') as f:
+        assert f.read() == b'I agree!'
+
+
+def test_replay_uploads_spooled_content_then_creates_page(spool, monkeypatch):
+    def down(notion_token, content, filename):
+        raise requests.ConnectionError("connection refused")
+
+    monkeypatch.setattr(archive, 'upload_file', down)
+    archive.create_page('secret_token', 'db-1', make_file())
+    record = spooled_records(spool)[0]
+
+    uploaded = []
+    created = []
+
+    def upload_file(notion_token, content, filename):
+        uploaded.append(content.open().read())
+        return 'upload-1'
+
+    def notion_request(method, path, notion_token, **kwargs):
+        assert notion_token == 'secret_token'
+        created.append(kwargs['json'])
+        return FakeResponse(200, {'id': 'page-1'})
+
+    monkeypatch.setattr(archive, 'upload_file', upload_file)
+    monkeypatch.setattr(archive, 'notion_request', notion_request)
+
+    assert archive.replay_page(record) is True
+    assert uploaded == [b'I agree!']
+    assert created[0]['children'][0]['file']['file_upload'] == {'id': 'upload-1'}
+    assert not os.path.exists(record['upload']['path'])
+
+
+def test_replay_waits_while_upload_still_failing(spool, monkeypatch):
+    def down(notion_token, content, filename):
+        raise NotionUnavailableError("Notion file upload create failed: 502")
+
+    monkeypatch.setattr(archive, 'upload_file', down)
+    archive.create_page('secret_token', 'db-1', make_file())
+    record = spooled_records(spool)[0]
+
+    assert archive.replay_page(record) is False
+    assert os.path.exists(record['upload']['path'])
+
+
+def test_processes_sharing_a_spool_follow_each_others_segments(tmp_path):
+    first = ArchiveSpool(str(tmp_path))
+    second = ArchiveSpool(str(tmp_path))
+    first.append({'n': 1})
+    second.seal()
+    first.append({'n': 2})
+
+    sealed = second.sealed_segments()
+    assert [record['n'] for segment in sealed for _, record in second.pending(segment)] == [1]
+    assert first.sealed_segments() == sealed
+
+
+def test_only_one_spool_instance_replays(tmp_path):
+    first = ArchiveSpool(str(tmp_path))
+    second = ArchiveSpool(str(tmp_path))
+    assert first.acquire_replayer()
+    assert not second.acquire_replayer()
+    assert first.acquire_replayer()
+
+
+def test_rejected_upload_still_creates_the_page(spool, monkeypatch):
+    def rejected(notion_token, content, filename):
+        raise archive.ArchiveError("Notion file upload create failed: file too large", status_code=502)
+
+    created = []
+
+    def notion_request(method, path, notion_token, **kwargs):
+        created.append(kwargs['json'])
+        return FakeResponse(200, {'id': 'page-1'})
+
+    monkeypatch.setattr(archive, 'upload_file', rejected)
+    monkeypatch.setattr(archive, 'notion_request', notion_request)
+
+    assert archive.create_page('secret_token', 'db-1', make_file()) == ('Agreement', True)
+    assert len(created) == 1
+    assert 'children' not in created[0]
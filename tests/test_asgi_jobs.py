@@ -0,0 +1,68 @@
+import asyncio
+import json
+import threading
+from app.asgi import create_asgi_app
+from app.api.verify import verification_jobs
+
+
+async def get(app, path, query=b'', headers=()):
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query, 'headers': list(headers)}
+    await app(scope, receive, send)
+    return sent
+
+
+def finish_later(job, result, delay=0.1):
+    # Jobs finish on whatever thread runs the verification
+    threading.Timer(delay, job.finish, (result,)).start()
+
+
+def body(sent):
+    return b''.join(message.get('body', b'') for message in sent[1:]).decode('utf-8')
+
+
+def test_long_poll_and_events_are_served_without_the_wsgi_bridge():
+    async def run():
+        app = create_asgi_app()
+        app.startup()
+
+        async def bridged(scope, receive, send):
+            raise AssertionError(f"{scope['path']} was handed to the WSGI thread pool")
+
+        app.wsgi = bridged
+
+        job = verification_jobs.create()
+        finish_later(job, {'verified': True})
+        sent = await get(app, f'/api/verifyPhone/{job.id}', b'wait=5')
+        assert sent[0]['status'] == 200
+        assert json.loads(sent[1]['body'])['result'] == {'verified': True}
+
+        job = verification_jobs.create()
+        job.set_status('ringing')
+        finish_later(job, {'verified': False})
+        sent = await asyncio.wait_for(get(app, f'/api/verifyPhone/{job.id}/events'), 5)
+        assert dict(sent[0]['headers'])[b'content-type'].startswith(b'text/event-stream')
+        assert 'event: status' in body(sent) and 'event: result' in body(sent)
+
+        resumed = await get(app, f'/api/verifyPhone/{job.id}/events', headers=[(b'last-event-id', b'1')])
+        assert 'event: status' not in body(resumed) and 'event: result' in body(resumed)
+
+        assert (await get(app, '/api/verifyPhone/unknown'))[0]['status'] == 404
+
+    asyncio.run(run())
+
+
+def test_wait_async_times_out():
+    async def run():
+        job = verification_jobs.create()
+        assert await job.wait_done_async(0.05) is False
+        assert await job.wait_async(0, timeout=0.05) == []
+
+    asyncio.run(run())
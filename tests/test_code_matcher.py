@@ -0,0 +1,47 @@
+from app.utils.code_matcher import digit_runs, match_code
+
+
+def user(text):
+    return {'role': 'user', 'message': text}
+
+
+def test_spoken_code_matches():
+    assert match_code([user("four two one seven")], '4217') == (True, "Code matched in transcript")
+    assert match_code([user("it's 4-2-1-7")], '4217')[0] is True
+    assert match_code([user("double four one seven")], '4417')[0] is True
+
+
+def test_longer_digit_run_containing_the_code_does_not_match():
+    assert digit_runs("nine four two one seven three") == ['942173']
+    verified, _ = match_code([user("nine four two one seven three")], '4217')
+    assert verified is not True
+
+
+def test_reading_out_every_digit_does_not_match():
+    messages = [user("0 1 2 3 4 5 6 7 8 9"), user("0123456789")]
+    assert match_code(messages, '4567') == (None, None)
+
+
+def test_wrong_codes_fail():
+    messages = [user("one two three four"), user("it's 9876")]
+    assert match_code(messages, '4217') == (False, "Incorrect code given 2 times")
+
+
+def test_repeated_code_split_by_sentences_matches():
+    assert digit_runs("4217. 4217.") == ['4217', '4217']
+    assert match_code([user("4217. 4217.")], '4217')[0] is True
+
+
+def test_repeated_code_in_one_run_is_ambiguous():
+    messages = [user("It is 4217, 4217"), user("four two one seven four two one seven")]
+    assert match_code(messages, '4217') == (None, None)
+
+
+def test_number_next_to_the_code():
+    assert match_code([user("I have one. 4217")], '4217')[0] is True
+    messages = [user("one 4217"), user("4217 and 5")]
+    assert match_code(messages, '4217') == (None, None)
+
+
+def test_assistant_turns_are_ignored():
+    assert match_code([{'role': 'assistant', 'message': "Your code is 4217"}], '4217') == (None, None)
@@ -0,0 +1,20 @@
+import os
+from app import create_app
+from app import supabase_db
+from app.api import verify
+
+
+def test_cooldown_and_storage_files_live_under_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(verify, 'COOLDOWN_BACKEND', 'sqlite')
+    monkeypatch.setattr(supabase_db, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(supabase_db, 'storage', None)
+    monkeypatch.setattr('config.Config.DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.chdir(tmp_path)
+
+    app = create_app()
+    # record_once only fires for the first app, so build this one's store directly
+    assert verify.create_recent_calls(app.config).acquire('+15550100', 30)
+    supabase_db.get_storage()
+    assert {'cooldowns.db', 'docuvoice.db'} <= set(os.listdir(tmp_path / 'data'))
+    assert not os.path.exists(tmp_path / 'cooldowns.db')
+    assert not os.path.exists(tmp_path / 'docuvoice.db')
@@ -0,0 +1,27 @@
+import base64
+import io
+from app.utils import archive_stream
+from app.utils.archive_stream import ContentWriter, FileContent
+from app.utils.notion_upload import content_view
+
+DATA = bytes(range(256)) * 64
+
+
+def test_content_view_in_memory():
+    content = FileContent.from_base64(base64.b64encode(DATA).decode())
+    assert isinstance(content.fileobj, io.BytesIO)
+    with content_view(content) as view:
+        assert bytes(view) == DATA
+
+
+def test_content_view_after_spilling_to_disk(monkeypatch):
+    monkeypatch.setattr(archive_stream, 'SPOOL_MAX_MEMORY', 1024)
+    encoded = base64.b64encode(DATA).decode()
+    writer = ContentWriter()
+    # The first chunk fits in memory, the rest spills it to disk
+    writer.write(encoded[:800])
+    writer.write(encoded[800:])
+    content = writer.finish()
+    assert not isinstance(content.fileobj, io.BytesIO)
+    with content_view(content) as view:
+        assert bytes(view) == DATA
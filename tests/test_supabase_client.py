@@ -0,0 +1,15 @@
+import importlib
+from app import create_app
+from app.utils import supabase_client
+
+
+def test_debug_route_reports_client_reuse(monkeypatch):
+    holder = supabase_client.SupabaseClientHolder()
+    monkeypatch.setattr(supabase_client, 'create_client', lambda url, key, options=None: object())
+    # app.api re-exports the blueprint under the module's name
+    monkeypatch.setattr(importlib.import_module('app.api.oauth'), 'supabase_clients', holder)
+    first = holder.get('https://example.supabase.co', 'key')
+    assert holder.get('https://example.supabase.co', 'key') is first
+
+    stats = create_app().test_client().get('/oauth/debug/supabase').get_json()
+    assert stats == {'builds': 1, 'reuses': 1, 'connected': True}
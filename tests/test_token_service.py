@@ -0,0 +1,110 @@
+import base64
+import time
+import jwt
+import pytest
+from app.utils.token_service import TokenService
+
+SECRET = 'test-secret-' + 'x' * 52
+
+
+def pyjwt_decode(token, leeway=0):
+    return jwt.decode(token, SECRET, algorithms=['HS256'], leeway=leeway)
+
+
+def outcome(decode, token):
+    try:
+        return decode(token)
+    except jwt.InvalidTokenError as e:
+        return type(e)
+
+
+NOW = int(time.time())
+
+CLAIMS = [
+    {'sub': 'valid', 'exp': NOW + 3600},
+    {'sub': 'no-exp'},
+    {'sub': 'expired', 'exp': NOW - 10},
+    {'sub': 'exp-string', 'exp': 'tomorrow'},
+    {'sub': 'not-yet-valid', 'nbf': NOW + 3600, 'exp': NOW + 7200},
+    {'sub': 'nbf-string', 'nbf': 'soon'},
+    {'sub': 'issued', 'iat': NOW},
+    {'sub': 'iat-string', 'iat': 'today'},
+    {'sub': 'iat-in-future', 'iat': NOW + 3600},
+]
+
+
+@pytest.mark.parametrize('claims', CLAIMS, ids=[claims['sub'] for claims in CLAIMS])
+def test_verify_matches_pyjwt_on_claims(claims):
+    token = jwt.encode(claims, SECRET, algorithm='HS256')
+    service = TokenService(SECRET)
+    expected = outcome(pyjwt_decode, token)
+    assert outcome(service.verify, token) == expected
+    # Cached or not, the answer is the same
+    assert outcome(service.verify, token) == expected
+
+
+MALFORMED = [
+    'not-a-jwt',
+    'a.b',
+    'a.b.c',
+    jwt.encode({'sub': 'x'}, 'other-secret-' + 'y' * 52, algorithm='HS256'),
+    jwt.encode({'sub': 'x'}, SECRET, algorithm='HS512'),
+    jwt.encode({'sub': 'x'}, SECRET, algorithm='HS256')[:-2],
+    jwt.encode({'sub': 'x'}, SECRET, algorithm='HS256', headers={'kid': 'other'}),
+]
+
+
+@pytest.mark.parametrize('token', MALFORMED)
+def test_verify_matches_pyjwt_on_malformed_tokens(token):
+    assert outcome(TokenService(SECRET).verify, token) == outcome(pyjwt_decode, token)
+
+
+def test_leeway_matches_pyjwt():
+    token = jwt.encode({'sub': 'x', 'exp': NOW - 5, 'nbf': NOW + 5}, SECRET, algorithm='HS256')
+    assert TokenService(SECRET, leeway=30).verify(token) == pyjwt_decode(token, leeway=30)
+
+
+def test_issued_tokens_decode_with_pyjwt():
+    service = TokenService(SECRET)
+    token = service.issue({'sub': 'x', 'exp': NOW + 60})
+    assert pyjwt_decode(token) == {'sub': 'x', 'exp': NOW + 60}
+
+
+def test_revoked_token_is_rejected_even_when_cached():
+    service = TokenService(SECRET)
+    token = service.issue({'type': 'refresh_token', 'jti': '1', 'exp': NOW + 60})
+    service.verify(token)
+    service.revoke(token)
+    with pytest.raises(jwt.InvalidTokenError):
+        service.verify(token)
+    assert service.stats()['revoked'] == 1
+
+
+def test_revoked_tokens_are_dropped_once_expired(monkeypatch):
+    service = TokenService(SECRET)
+    expiring = service.issue({'sub': 'x', 'exp': NOW + 60})
+    lasting = service.issue({'sub': 'y', 'exp': NOW + 3600})
+    service.revoke(expiring)
+    service.revoke(lasting)
+    monkeypatch.setattr(time, 'time', lambda: NOW + 120)
+    service.revoke(service.issue({'sub': 'z'}))
+    assert service.stats()['revoked'] == 2
+    with pytest.raises(jwt.InvalidTokenError):
+        service.verify(lasting)
+
+
+def test_refresh_grant_returns_the_presented_refresh_token():
+    from app import create_app
+    app = create_app()
+    client = app.test_client()
+    credentials = f"{app.config['OAUTH_CLIENT_ID']}:{app.config['OAUTH_CLIENT_SECRET']}"
+    headers = {'Authorization': 'Basic ' + base64.b64encode(credentials.encode()).decode()}
+    issued = client.post('/oauth/token', data={
+        'grant_type': 'authorization_code', 'code': app.config['AUTHORIZATION_CODE']
+    }, headers=headers).get_json()
+    for _ in range(2):
+        refreshed = client.post('/oauth/token', data={
+            'grant_type': 'refresh_token', 'refresh_token': issued['refresh_token']
+        }, headers=headers)
+        assert refreshed.status_code == 200
+        assert refreshed.get_json()['refresh_token'] == issued['refresh_token']